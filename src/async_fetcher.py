@@ -0,0 +1,91 @@
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from time import monotonic
+import asyncio
+import random
+
+from metrics import Metrics
+from logger import Logger
+
+
+class HostRateLimiter:
+    def __init__(self, requests_per_second: float) -> None:
+        self.interval = 1 / requests_per_second if requests_per_second > 0 else 0
+        self.next_slots = {}
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, url: str) -> None:
+        # Hands out evenly spaced time slots for each host, callers sleep until their slot comes.
+        host = urlparse(url).netloc
+        async with self.lock:
+            now = monotonic()
+            slot = max(now, self.next_slots.get(host, now))
+            self.next_slots[host] = slot + self.interval
+
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class AsyncFetcher:
+    """
+    Fetches (key, url) pairs from a shared queue with at most `concurrency` requests in flight.
+
+    fetch is a blocking callable that returns the result for a URL (e.g. the parsed response), or None when the response
+    is not usable. It is run on a thread pool so the existing requests based code can be reused, anything CPU heavy
+    should be done in it as well. Failed fetches are retried with a jittered exponential backoff, up to max_retries
+    attempts. on_result is called with (key, result) for every item, on the event loop's thread.
+    """
+
+    def __init__(self, fetch, concurrency: int=16, requests_per_second: float=20, max_retries: int=3,
+                 backoff_base: float=0.5, backoff_cap: float=8.0, log_prefix: str="") -> None:
+        self.fetch = fetch
+        self.concurrency = concurrency
+        self.rate_limiter_rps = requests_per_second
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.log_prefix = log_prefix
+
+    def get_backoff_duration(self, attempt: int) -> float:
+        # "Full jitter", spreads the retries of the workers that failed at the same time.
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    async def fetch_with_backoff(self, executor, rate_limiter: HostRateLimiter, key, url: str):
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries):
+            await rate_limiter.acquire(url)
+            try:
+                result = await loop.run_in_executor(executor, self.fetch, url)
+                if result:
+                    return result
+                Logger.log_warning(f"{self.log_prefix} Unusable response for {key}")
+            except Exception as e:
+                Logger.log_warning(f"{self.log_prefix} Error fetching {key}: {e}")
+
+            if attempt < self.max_retries - 1:
+                Metrics.increment("async_fetch_retries")
+                await asyncio.sleep(self.get_backoff_duration(attempt))
+
+        return None
+
+    async def worker(self, queue: asyncio.Queue, executor, rate_limiter: HostRateLimiter, on_result) -> None:
+        while True:
+            try:
+                key, url = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            on_result(key, await self.fetch_with_backoff(executor, rate_limiter, key, url))
+
+    async def fetch_all(self, items: list[tuple], on_result) -> None:
+        queue = asyncio.Queue()
+        for item in items:
+            queue.put_nowait(item)
+
+        rate_limiter = HostRateLimiter(self.rate_limiter_rps)
+        worker_count = max(1, min(self.concurrency, len(items)))
+        with ThreadPoolExecutor(max_workers=worker_count) as executor:
+            await asyncio.gather(*[self.worker(queue, executor, rate_limiter, on_result) for _ in range(worker_count)])
+
+    def run(self, items: list[tuple], on_result) -> None:
+        asyncio.run(self.fetch_all(items, on_result))
@@ -0,0 +1,241 @@
+from urllib.parse import urlsplit, parse_qs
+from statistics import median
+from time import perf_counter
+import subprocess
+import argparse
+import tempfile
+import shutil
+import json
+import sys
+import os
+
+from lesson_http_scraper import LessonHttpScraper
+from course_scraper import CourseScraper
+from lesson_normalizer import LessonNormalizer
+from recorder import Recorder
+from logger import Logger
+from constants import *
+
+RUN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "run.py")
+
+# The files a target writes, their line count is the number of rows it produced.
+TARGET_OUTPUT_FILE_PATHS = {
+    "lesson": [LESSONS_FILE_PATH],
+    "course": [COURSES_FILE_PATH],
+    "course_plan": [COURSE_PLANS_FILE_PATH],
+    "misc": [BUILDING_CODES_FILE_PATH, PROGRAMME_CODES_FILE_PATH],
+}
+
+
+def count_lines(file_path: str) -> int:
+    if not os.path.exists(file_path):
+        return 0
+
+    with open(file_path, "rb") as f:
+        return sum(1 for _ in f)
+
+
+def run_once(archive_dir: str, target: str, extra_args: list[str]) -> dict:
+    # Every run starts from the data files the recording started with, in a directory of its own.
+    with tempfile.TemporaryDirectory(prefix="benchmark_") as work_dir:
+        shutil.copytree(os.path.join(archive_dir, "data"), os.path.join(work_dir, "data"))
+
+        command = [
+            sys.executable, RUN_PATH, "-scrap_target", target, "-replay", archive_dir,
+            "-no_http_cache", "-log_console", "plain", *extra_args,
+        ]
+        with open(os.path.join(work_dir, "run.log"), "w", encoding="utf-8") as log_file:
+            result = subprocess.run(command, cwd=work_dir, stdout=log_file, stderr=subprocess.STDOUT)
+
+        if result.returncode != 0:
+            with open(os.path.join(work_dir, "run.log"), "r", encoding="utf-8") as f:
+                Logger.log_error(f"\"{target}\" run failed with exit code {result.returncode}:\n{f.read()[-2000:]}")
+            raise RuntimeError(f"\"{target}\" run failed.")
+
+        with open(os.path.join(work_dir, METRICS_REPORT_FILE_PATH), "r", encoding="utf-8") as f:
+            report = json.load(f)
+
+        report["rows"] = sum(count_lines(os.path.join(work_dir, p)) for p in TARGET_OUTPUT_FILE_PATHS.get(target, []))
+        return report
+
+
+def iter_recorded_pages(url_prefix: str):
+    # Bodies of the loaded recording whose URL starts with url_prefix.
+    for entry in Recorder.entries.values():
+        if entry["url"].startswith(url_prefix) and entry["status"] == 200:
+            yield entry["url"], Recorder.read_body(entry).decode("utf-8", errors="replace")
+
+
+def get_lesson_rows() -> list[str]:
+    # Tables of the lesson API (http engine) and the lesson page of every branch code (Selenium engine).
+    pages = list(iter_recorded_pages(LESSONS_API_URL.split("?")[0])) + list(iter_recorded_pages(f"{LESSONS_URL}#"))
+    return [row for _, html in pages for row in LessonHttpScraper.get_table_rows(html)]
+
+
+def normalize_lessons(rows: list[str]) -> None:
+    [lesson.to_psv() for lesson in LessonNormalizer.normalize_lesson_rows(rows)]
+
+
+def get_course_pages() -> list[tuple[str, str]]:
+    # (course code, html) of every recorded course API page, the code is only used to pick one of the merged courses.
+    pages = []
+    for url, html in iter_recorded_pages(COURSES_API_URL.split("?")[0]):
+        query = parse_qs(urlsplit(url).query)
+        pages.append((f"{query['bransKodu'][0]}{query['dersNo'][0]}", html))
+    return pages
+
+
+def scrap_course_tables(pages: list[tuple[str, str]]) -> None:
+    course_scraper = CourseScraper(None)
+    for course_code, html in pages:
+        course_scraper.scrap_table_html(html, course_code)
+
+
+# name -> (get the inputs from the loaded recording, process the inputs), only the processing is timed.
+MICRO_BENCHMARKS = {
+    "lesson_normalize": (get_lesson_rows, normalize_lessons),
+    "course_table": (get_course_pages, scrap_course_tables),
+}
+
+
+def run_micro_benchmark(name: str, archive_dir: str, repeat: int) -> dict|None:
+    Recorder.load(archive_dir)
+    get_inputs, process = MICRO_BENCHMARKS[name]
+    inputs = get_inputs()
+    if not inputs:
+        return None
+
+    durations = []
+    for _ in range(repeat):
+        t0 = perf_counter()
+        process(inputs)
+        durations.append(perf_counter() - t0)
+
+    wall_time = median(durations)
+    return {
+        "runs": repeat,
+        "wall_time": round(wall_time, 4),
+        "rows": len(inputs),
+        "rows_per_second": round(len(inputs) / wall_time, 2) if wall_time else 0,
+        "stages": {},
+    }
+
+
+def summarize(reports: list[dict]) -> dict:
+    wall_time = median(r["wall_time"] for r in reports)
+    requests = median(sum(h["requests"] for h in r["hosts"].values()) for r in reports)
+    stage_names = sorted({name for r in reports for name in r["stages"]})
+
+    return {
+        "runs": len(reports),
+        "wall_time": round(wall_time, 3),
+        "cpu_time": round(median(r["cpu_time"] for r in reports), 3),
+        "peak_rss_mb": max((r["peak_rss_mb"] or 0) for r in reports),
+        "requests": requests,
+        "requests_per_second": round(requests / wall_time, 2) if wall_time else 0,
+        "rows": reports[-1]["rows"],
+        "rows_per_second": round(reports[-1]["rows"] / wall_time, 2) if wall_time else 0,
+        "stages": {
+            name: round(median(r["stages"].get(name, {}).get("wall", 0) for r in reports), 4) for name in stage_names
+        },
+    }
+
+
+def run_micro_benchmarks(archive_dir: str, repeat: int) -> dict:
+    results = {}
+    for micro_name in MICRO_BENCHMARKS:
+        name = f"{micro_name}:{os.path.basename(archive_dir)}"
+        summary = run_micro_benchmark(micro_name, archive_dir, repeat)
+        if summary is None:
+            Logger.log_info(f"[blue]{name}[/blue]: the recording has no pages for it, skipping.")
+            continue
+
+        results[name] = summary
+        Logger.log_info(
+            f"[blue]{name}[/blue]: [green]{summary['wall_time']}[/green] seconds for {summary['rows']} rows, "
+            f"{summary['rows_per_second']} rows/s."
+        )
+
+    return results
+
+
+def run_replay_benchmark(archive_dir: str, repeat: int, run_args: list[str]) -> dict:
+    target = Recorder.load(archive_dir)["meta"]["target"]
+    name = f"{target}:{os.path.basename(archive_dir)}"
+
+    reports = []
+    for i in range(repeat):
+        Logger.log_info(f"Replaying [blue]{name}[/blue], run {i + 1}/{repeat}...")
+        reports.append(run_once(archive_dir, target, run_args))
+
+    summary = summarize(reports)
+    Logger.log_info(
+        f"[blue]{name}[/blue]: [green]{summary['wall_time']}[/green] seconds, {summary['requests_per_second']} "
+        f"requests/s, {summary['rows_per_second']} rows/s, peak RSS {summary['peak_rss_mb']} MB."
+    )
+    for stage, wall in sorted(summary["stages"].items(), key=lambda item: -item[1]):
+        Logger.log_info(f"    Stage [blue]{stage}[/blue]: {wall} seconds")
+
+    return {name: summary}
+
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for name, summary in results.items():
+        baseline_summary = baseline.get(name)
+        if baseline_summary is None:
+            continue
+
+        checks = [("wall_time", summary["wall_time"], baseline_summary["wall_time"])]
+        checks += [
+            (f"stage {stage}", wall, baseline_summary["stages"][stage])
+            for stage, wall in summary["stages"].items() if stage in baseline_summary["stages"]
+        ]
+        for label, value, baseline_value in checks:
+            if baseline_value > 0 and value > baseline_value * (1 + tolerance):
+                regressions.append(f"{name} {label}: {baseline_value} -> {value} seconds")
+
+    return regressions
+
+
+parser = argparse.ArgumentParser(description="Runs the scrapers against recordings made with run.py -record and reports their performance.")
+parser.add_argument('archive_dirs', type=str, nargs="+",
+                    help="recordings to replay, each one is run with the target it was recorded with.")
+parser.add_argument('-repeat', type=int, default=3,
+                    help="number of runs per recording, the medians are reported.")
+parser.add_argument('-micro', action="store_true",
+                    help=f"times the parsing steps on the recorded pages instead of replaying whole runs: {list(MICRO_BENCHMARKS)}.")
+parser.add_argument('-output', type=str, default=None,
+                    help="writes the results to this JSON file, it can be used as a -baseline later.")
+parser.add_argument('-baseline', type=str, default=None,
+                    help="results of an earlier benchmark, exits with 1 if anything got slower than the tolerance.")
+parser.add_argument('-tolerance', type=float, default=.1,
+                    help="how much slower than the baseline is still fine, .1 means 10%%.")
+parser.add_argument('-run_args', type=str, nargs=argparse.REMAINDER, default=[],
+                    help="arguments passed to run.py as is, e.g. -run_args -course_fetch_mode async")
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    Logger.start()
+
+    results = {}
+    for archive_dir in [os.path.abspath(d) for d in args.archive_dirs]:
+        if args.micro:
+            results.update(run_micro_benchmarks(archive_dir, args.repeat))
+        else:
+            results.update(run_replay_benchmark(archive_dir, args.repeat, args.run_args))
+
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+
+        for regression in regressions:
+            Logger.log_error(f"Regression: {regression}")
+        if regressions:
+            Logger.stop()
+            sys.exit(1)
+        Logger.log_info("[green]No regressions compared to the baseline.[/green]")
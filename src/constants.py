@@ -1,5 +1,7 @@
 # === URLS ===
 LESSONS_URL = "https://obs.itu.edu.tr/public/DersProgram"
+LESSONS_BRANCH_CODES_API_URL = "https://obs.itu.edu.tr/public/DersProgram/SearchBransKoduByProgramSeviye?programSeviyeTipiAnahtari={0}"
+LESSONS_API_URL = "https://obs.itu.edu.tr/public/DersProgram/DersProgramSearch?programSeviyeTipiAnahtari={0}&dersBransKoduId={1}"
 COURSES_URL = "https://www.sis.itu.edu.tr/TR/ogrenci/lisans/ders-bilgileri/ders-bilgileri.php"
 COURSES_API_URL = "https://obs.itu.edu.tr/public/DersBilgi/DersBilgiSearch?bransKodu={0}&dersNo={1}"
 COURSE_PLAN_URLS = {
@@ -21,10 +23,47 @@ PROGRAMME_CODES_URLS = {
 
 # === FILE NAMES ===
 LESSONS_FILE_PATH = "data/lessons.psv"
+LESSONS_CHANGELOG_FILE_PATH = "data/lessons_changelog.jsonl"
 COURSES_FILE_PATH = "data/courses.psv"
+COURSE_FINGERPRINTS_FILE_PATH = "data/course_fingerprints.json"
+COURSE_CODE_INDEX_FILE_PATH = "data/course_code_index.json"
+CHROMEDRIVER_CACHE_DIR = "data/.chromedriver"
 COURSE_PLANS_FILE_PATH = "data/course_plans.txt"
 BUILDING_CODES_FILE_PATH = "data/building_codes.psv"
 PROGRAMME_CODES_FILE_PATH = "data/programme_codes.psv"
+HTTP_CACHE_DIR = "data/.http_cache"
 
 # === OTHER ===
+SORTED_FILE_RUN_SIZE = 5000  # Lines kept in memory before being spilled to disk while writing sorted files.
+LESSON_NORMALIZE_BATCH_SIZE = 500  # Scraped lesson rows normalized together.
+COURSE_QUEUE_SIZE = 1000
 MAX_THREAD_COUNT = 4
+BRANCH_CODE_POLL_INTERVAL = 1  # Seconds the lesson browsers wait for a branch code before checking if they are done.
+SELECTIVE_COURSE_WORKER_COUNT = 8
+MAX_CONCURRENT_REQUESTS = 16  # Used by the async fetch mode.
+REQUESTS_PER_SECOND_PER_HOST = 20
+
+# Shared HTTP client
+HTTP_POOL_MAXSIZE = 16  # Connections kept alive per host.
+HTTP_RETRY_COUNT = 5
+HTTP_BACKOFF_FACTOR = 1
+HTTP_TIMEOUT = 25
+
+# Adaptive concurrency, requests in flight per host. Grows by 1 for every limit many healthy responses and is cut by
+# the factor on 429/5xx responses and timeouts.
+HTTP_CONCURRENCY_INITIAL = 4
+HTTP_CONCURRENCY_MIN = 1
+HTTP_CONCURRENCY_DECREASE_FACTOR = .5
+HTTP_CONCURRENCY_LATENCY_TOLERANCE = 3  # Responses slower than this times the average latency don't grow the limit.
+
+# WebDriver, None installs the one matching the installed Chrome. Either way it's pinned after the first install.
+CHROMEDRIVER_VERSION = None
+
+# Lesson scheduling
+LESSON_SCHEDULE_FILE_PATH = "data/lesson_schedule.json"
+LESSON_SCHEDULE_HISTORY = 288  # Changelog entries looked at when ranking the branch codes, about a day.
+LESSON_HOT_BRANCH_LIMIT = 40  # Branch codes scraped on every run.
+LESSON_TIME_BUDGET = 240  # Seconds, the lesson workflow times out after 8 minutes.
+
+# Run metrics, per stage timings, per host request stats and counters of the last run.
+METRICS_REPORT_FILE_PATH = "data/run_metrics.json"
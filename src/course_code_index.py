@@ -0,0 +1,117 @@
+from datetime import datetime, timezone
+from hashlib import sha1
+from os import path
+import json
+import os
+
+from course_plan_store import CoursePlanFormat
+from logger import Logger
+from constants import *
+
+
+class CourseCodeIndex:
+    """
+    Persistent index of the course codes referenced by the scraped data files.
+
+    For every source file the content hash and the codes found in it are stored, so a file is only parsed again when
+    its content changed. For every code, the sources mentioning it and when it was first/last seen are stored.
+
+    {
+        "sources": {"lessons": {"hash": ..., "codes": [...]}, ...},
+        "codes": {"BLG 101E": {"sources": ["lessons", ...], "first_seen": ..., "last_seen": ...}, ...}
+    }
+    """
+
+    def __init__(self, file_path: str=COURSE_CODE_INDEX_FILE_PATH) -> None:
+        self.file_path = file_path
+        self.sources = {}
+        self.codes = {}
+        self.new_codes = set()
+
+        # name -> (path, parser), parsers take the lines of the file and return the codes in it.
+        self.source_files = {
+            "lessons": (LESSONS_FILE_PATH, self.parse_lessons),
+            "course_plans": (COURSE_PLANS_FILE_PATH, self.parse_course_plans),
+            "courses": (COURSES_FILE_PATH, self.parse_courses),
+        }
+
+    @staticmethod
+    def parse_lessons(lines) -> set[str]:
+        return {l.split("|")[1] for l in lines if "|" in l}
+
+    @staticmethod
+    def parse_course_plans(lines) -> set[str]:
+        codes = set()
+        for line in lines:
+            if not line.startswith("#"):
+                codes.update(CoursePlanFormat.get_course_codes(line))
+
+        return codes
+
+    @staticmethod
+    def parse_courses(lines) -> set[str]:
+        return {l.split("|", 1)[0] for l in lines if "|" in l}
+
+    def load(self) -> None:
+        self.sources, self.codes = {}, {}
+        if not path.exists(self.file_path):
+            return
+
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.sources, self.codes = data["sources"], data["codes"]
+        except (ValueError, KeyError) as e:
+            Logger.log_warning(f"Course code index is corrupted, it will be built again: {e}")
+
+    def save(self) -> None:
+        tmp_path = f"{self.file_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"sources": self.sources, "codes": self.codes}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.file_path)
+
+    def update(self) -> None:
+        self.load()
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+        source_codes = {}
+        for name, (file_path, parse) in self.source_files.items():
+            if not path.exists(file_path):
+                self.sources.pop(name, None)
+                continue
+
+            with open(file_path, "rb") as f:
+                content = f.read()
+            content_hash = sha1(content).hexdigest()
+
+            source = self.sources.get(name)
+            if source is None or source["hash"] != content_hash:
+                codes = {c.strip() for c in parse(content.decode("utf-8").splitlines())}
+                codes.discard("")
+                source = {"hash": content_hash, "codes": sorted(codes)}
+                self.sources[name] = source
+                Logger.log_info(f"Course code index: \"{file_path}\" changed, found {len(codes)} codes in it.")
+
+            source_codes[name] = set(source["codes"])
+
+        # Recompute the sources of every code, codes that are not referenced anymore keep their last_seen.
+        self.new_codes = set()
+        for entry in self.codes.values():
+            entry["sources"] = []
+        for name, codes in source_codes.items():
+            for code in codes:
+                entry = self.codes.get(code)
+                if entry is None:
+                    entry = {"sources": [], "first_seen": now, "last_seen": now}
+                    self.codes[code] = entry
+                    self.new_codes.add(code)
+
+                entry["sources"].append(name)
+                entry["last_seen"] = now
+
+        self.save()
+
+    def get_course_codes(self) -> list[str]:
+        # Newly referenced codes come first so they are scraped first, the rest follow in sorted order.
+        referenced_codes = [code for code, entry in self.codes.items() if entry["sources"]]
+        return sorted(referenced_codes, key=lambda code: (code not in self.new_codes, code))
@@ -1,10 +1,11 @@
 from scraper import Scraper
+from metrics import Metrics
 from logger import Logger
-from selenium.webdriver.common.by import By
+from concurrent.futures import Future, ThreadPoolExecutor
 import threading
+import queue
 import re
 from time import perf_counter
-from selenium.webdriver.support import expected_conditions as EC
 from constants import *
 
 class CoursePlanScraper(Scraper):
@@ -13,17 +14,76 @@ class CoursePlanScraper(Scraper):
     def __init__(self, driver) -> None:
         super().__init__(driver)
         self.faculty_course_plans = {}
+        self.programme_iterations = {}  # (faculty, programme name, programme code) -> (iteration names, results)
+        self.unit_timings = []
+        self.unit_lock = threading.Lock()
+
+        # The same selective course list is referenced by many iterations and programmes, each distinct list is
+        # downloaded once per run on a shared pool and the results are memoized by URL.
+        self.selective_course_executor = None
+        self.selective_course_futures = {}
+        self.selective_course_lock = threading.Lock()
+        self.selective_course_reference_count = 0
+
+    def scrap_selective_courses(self, url: str) -> tuple[bool, list[str]]|None:
+        # Returns None if the page couldn't be loaded and a (table found, course codes) tuple otherwise.
+        selective_soup = self.get_soup_from_url(url)
+        if selective_soup is None:
+            return None
+
+        selective_course_table = selective_soup.find("table")
+        if selective_course_table is None:
+            return False, []
+
+        # First row is just the header.
+        selective_courses = []
+        for selective_row in selective_course_table.find_all("tr")[1:]:
+            selective_courses.append(selective_row.find("a").get_text().replace("\n", "").strip())
+
+        return True, selective_courses
+
+    def get_selective_courses_future(self, url: str) -> Future:
+        with self.selective_course_lock:
+            self.selective_course_reference_count += 1
+
+            if self.selective_course_executor is None:
+                self.selective_course_executor = ThreadPoolExecutor(max_workers=SELECTIVE_COURSE_WORKER_COUNT)
+
+            if url not in self.selective_course_futures:
+                self.selective_course_futures[url] = self.selective_course_executor.submit(self.scrap_selective_courses, url)
+
+            return self.selective_course_futures[url]
+
+    def forget_selective_courses(self, url: str, future: Future) -> None:
+        # Failed downloads are not memoized, the next reference tries again.
+        with self.selective_course_lock:
+            if self.selective_course_futures.get(url) is future:
+                del self.selective_course_futures[url]
+
+    def resolve_selective_courses(self, url: str, future: Future):
+        try:
+            result = future.result()
+        except Exception:
+            self.forget_selective_courses(url, future)
+            raise
+
+        if result is None:
+            self.forget_selective_courses(url, future)
+        return result
 
     def scrape_iteration_course_plan(self, url:str, log_prefix:str):
         soup = self.get_soup_from_url(url)  # Read the page.
 
         if soup is None:
-            Logger.log_error(f"{log_prefix} Failed to load the url {url}.")
+            Logger.log_error("%s Failed to load the url %s.", log_prefix, url)
             return [[dict()]]
 
         program_list = []
         tables = soup.find_all("table")  # Read all tables.
-        
+
+        # Selective course lists are requested as soon as they are seen and filled in once the whole page is read.
+        pending_selective_courses = []
+
         for table in tables:
             semester_program = []
             rows = table.find("tbody").find_all("tr")
@@ -35,44 +95,45 @@ class CoursePlanScraper(Scraper):
                 # When a course is selective, the first cell becomes a button with text ("Dersler" or "Courses")
                 if ("Dersler" or "Courses") in course_code:
                     selective_courses_title = cells[1].get_text()
-                    selective_soup = self.get_soup_from_url(f"https://obs.itu.edu.tr{cell0_a['href']}")
-
-                    selective_courses = []
-                    if selective_soup is not None:
-                        selective_course_table = selective_soup.find("table")
-
-                        if selective_course_table is not None:
-                            selective_course_rows = selective_course_table.find_all("tr")
-
-                            # First row is just the header.
-                            for selective_row in selective_course_rows[1:]:
-                                selective_courses.append(selective_row.find("a").get_text().replace("\n", "").strip())
-
-                            semester_program.append({selective_courses_title.replace("\n", "").strip(): selective_courses})
-                        else:
-                            # Because ITU changed their website, I have no fucking clue what the "selective courses like below" is
-                            # but the new UI might have fixed that issue. I'm leaving this here just in case
-                            # ---------------------------------------------------------------------------------------------------
-                            # TODO: Add support for selective courses like this:
-                            # https://www.sis.itu.edu.tr/TR/ogrenci/lisans/ders-planlari/plan/MAK/20031081.html
-                            semester_program.append({selective_courses_title: []})
+                    selective_url = f"https://obs.itu.edu.tr{cell0_a['href']}"
+                    future = self.get_selective_courses_future(selective_url)
+
+                    pending_selective_courses.append((semester_program, len(semester_program), selective_courses_title, selective_url, future))
+                    semester_program.append(None)
                 else:
                     semester_program.append(course_code)
 
             program_list.append(semester_program)
 
-        return program_list
+        for semester_program, index, selective_courses_title, selective_url, future in pending_selective_courses:
+            result = self.resolve_selective_courses(selective_url, future)
+
+            if result is None:
+                continue
+
+            found_table, selective_courses = result
+            if found_table:
+                semester_program[index] = {selective_courses_title.replace("\n", "").strip(): list(selective_courses)}
+            else:
+                # Because ITU changed their website, I have no fucking clue what the "selective courses like below" is
+                # but the new UI might have fixed that issue. I'm leaving this here just in case
+                # ---------------------------------------------------------------------------------------------------
+                # TODO: Add support for selective courses like this:
+                # https://www.sis.itu.edu.tr/TR/ogrenci/lisans/ders-planlari/plan/MAK/20031081.html
+                semester_program[index] = {selective_courses_title: []}
+
+        # Selective courses that couldn't be loaded are left out, like they used to be.
+        return [[course for course in semester_program if course is not None] for semester_program in program_list]
 
-    def scrap_iterations(self, program_name: str, iteration_url: str, log_prefix: str) -> dict:
-        program_iterations = dict()
+    def scrap_iteration_list(self, iteration_url: str) -> list[tuple[str, str]]:
         soup = self.get_soup_from_url(iteration_url)  # Read the page
 
         if soup is None:
-            return dict()
+            return []
 
         # If the URL is not valid
         if soup.find('h1', class_='text-danger'): 
-            return dict()
+            return []
 
         # Cache the urls for the program iterations (they are usually date ranges like 2001-2002, 2021-2022 ve Sonrası, etc.).
         iterations = []
@@ -80,104 +141,153 @@ class CoursePlanScraper(Scraper):
             cells = row.select("td")
             iteration_url = cells[0].select("a")[0]["href"]
             iteration_name = cells[1].get_text().strip()
-            iterations.append((iteration_name, f"https://obs.itu.edu.tr{iteration_url}"))
 
-        def scrap_iteration_and_save(key, url, retry_count=0):
-            if retry_count >= 5: 
-                program_iterations[key] = None
-                return
-            try:
-                program_iterations[key] = self.scrape_iteration_course_plan(url, log_prefix)
-            except Exception as e:
-                Logger.log_warning(f"{log_prefix} The following error was thrown while scraping a program iteration ([blue]{key}[/blue]) of [cyan]\"{program_name}\"[/cyan]:\n\n{e}")
-                self.wait()
-                scrap_iteration_and_save(key, url, retry_count + 1)
-
-        # Scrap all program iterations
-        for iteration_name, iteration_url in iterations:
-            Logger.log_info(f"{log_prefix} Scraping the iteration: [link={iteration_url}][dark_magenta]{iteration_name}[/dark_magenta][/link].")
-            
             # Trim the iteration name, up to the first 4 digid number.
             # This way we get "Fizik Mühendisliği Lisans Programı (%100 İngilizce) 2010-2011 / Güz Dönemi Sonrası" -> "2010-2011 / Güz Dönemi Sonrası"
             iteration_match = re.search(r'\d{4}', iteration_name)
             if iteration_match:
                 iteration_name = iteration_name[iteration_match.start():].strip()
-            
-            scrap_iteration_and_save(iteration_name, iteration_url)
 
-        return program_iterations
+            iterations.append((iteration_name, f"https://obs.itu.edu.tr{iteration_url}"))
+
+        return iterations
+
+    def scrap_iteration(self, program_name: str, iteration_name: str, iteration_url: str, log_prefix: str, retry_count: int=0):
+        if retry_count >= 5:
+            return None
+
+        try:
+            return self.scrape_iteration_course_plan(iteration_url, log_prefix)
+        except Exception as e:
+            Logger.log_warning("%s The following error was thrown while scraping a program iteration ([blue]%s[/blue]) of [cyan]\"%s\"[/cyan]:\n\n%s", log_prefix, iteration_name, program_name, e)
+            Metrics.increment("course_plan_iteration_retries")
+            self.wait()
+            return self.scrap_iteration(program_name, iteration_name, iteration_url, log_prefix, retry_count + 1)
+
+    def run_programme_unit(self, unit_queue: queue.Queue, programme_code: str, programme_name: str, faculty: str, programme_type: str, log_prefix: str) -> None:
+        # Finds the iterations of the programme and adds a unit for each of them to the queue.
+        for url in COURSE_PLAN_URLS[programme_type]:
+            Logger.log_info("%s Scraping the course plan for [blue]%s[/blue] in [blue]%s[/blue].", log_prefix, programme_name, faculty)
+            iterations = self.scrap_iteration_list(url.format(programme_code))
+            if len(iterations) == 0:
+                continue
 
-    def scrap_faculty_course_plans_routine(self, programme_codes: str, thread_no: int):
-        thread_prefix = f"[royal_blue1][Thread {str(thread_no).zfill(2)}][/royal_blue1]"
+            programme_key = (faculty, programme_name, programme_code)
+            with self.unit_lock:
+                self.programme_iterations[programme_key] = ([name for name, _ in iterations], [None] * len(iterations))
+            for i, (iteration_name, iteration_url) in enumerate(iterations):
+                unit_queue.put(("iteration", programme_key, i, iteration_name, iteration_url))
+            return
+
+        Logger.log_warning("%s Could not find any courses plan for [blue]%s[/blue] in [blue]%s[/blue].", log_prefix, programme_name, faculty)
+
+    def run_iteration_unit(self, programme_key: tuple, index: int, iteration_name: str, iteration_url: str, log_prefix: str) -> None:
+        Logger.log_info("%s Scraping the iteration: [link=%s][dark_magenta]%s[/dark_magenta][/link].", log_prefix, iteration_url, iteration_name)
+        result = self.scrap_iteration(programme_key[1], iteration_name, iteration_url, log_prefix)
+        with self.unit_lock:
+            self.programme_iterations[programme_key][1][index] = result
+
+    def course_plan_worker_routine(self, unit_queue: queue.Queue, worker_no: int) -> None:
+        log_prefix = f"[royal_blue1][Worker {str(worker_no).zfill(2)}][/royal_blue1]"
+        while True:
+            unit = unit_queue.get()
+            if unit is None:
+                unit_queue.task_done()
+                return
+
+            unit_name = unit[2] if unit[0] == "programme" else f"{unit[1][1]} / {unit[3]}"
+            t0 = perf_counter()
+            try:
+                if unit[0] == "programme":
+                    self.run_programme_unit(unit_queue, *unit[1:], log_prefix)
+                else:
+                    self.run_iteration_unit(*unit[1:], log_prefix)
+            except Exception as e:
+                Logger.log_error("%s Unexpected error while running the %s unit \"%s\": %s", log_prefix, unit[0], unit_name, e)
+            finally:
+                with self.unit_lock:
+                    self.unit_timings.append((unit[0], unit_name, perf_counter() - t0))
+                unit_queue.task_done()
+
+    def log_unit_timings(self, worker_count: int, wall_time: float) -> None:
+        if len(self.unit_timings) == 0:
+            return
+
+        total_work = sum(duration for _, __, duration in self.unit_timings)
+        Logger.log_info(
+            f"Ran {len(self.unit_timings)} course plan units on {worker_count} workers, "
+            f"total work: {round(total_work, 2)} s, wall time: {round(wall_time, 2)} s "
+            f"(ideal: {round(total_work / worker_count, 2)} s)."
+        )
+        for unit_type, name, duration in sorted(self.unit_timings, key=lambda t: t[2], reverse=True)[:5]:
+            Logger.log_info("Slow %s unit: [blue]%s[/blue] took %s s.", unit_type, name, round(duration, 2))
+
+    def assemble_faculty_course_plans(self, programme_codes: list) -> None:
+        # Put the results of the units back together in the programme codes file's order.
         for programme_code, programme_name, faculty, programme_type in programme_codes:
             if "Yandal" in programme_name:
-                Logger.log_info(f"{thread_prefix} Skipping the course plan for [blue]{programme_name}[/blue] in [blue]{faculty}[/blue] as it is a \"Yandal\" program.")
                 continue
-            
+
             if faculty not in self.faculty_course_plans:
                 self.faculty_course_plans[faculty] = {}
 
-            if programme_type not in COURSE_PLAN_URLS.keys():
-                Logger.log_error(f"{thread_prefix} Skipping the course plan for [blue]{programme_name}[/blue] in [blue]{faculty}[/blue] as the programme type \"{programme_type}\" is unknown.")
+            programme_key = (faculty, programme_name, programme_code)
+            if programme_key not in self.programme_iterations:
                 continue
 
-            for url in COURSE_PLAN_URLS[programme_type]:
-                Logger.log_info(f"{thread_prefix} Scraping the course plan for [blue]{programme_name}[/blue] in [blue]{faculty}[/blue].")
-                iters = self.scrap_iterations(programme_name, url.format(programme_code), thread_prefix)
-                if len(iters) != 0:
-                    self.faculty_course_plans[faculty][programme_name] = iters
-                    break
+            program_iterations = dict()
+            for iteration_name, result in zip(*self.programme_iterations[programme_key]):
+                program_iterations[iteration_name] = result
+            self.faculty_course_plans[faculty][programme_name] = program_iterations
 
-            if programme_name not in self.faculty_course_plans[faculty]:
-                Logger.log_warning(f"{thread_prefix} Could not find any courses plan for [blue]{programme_name}[/blue] in [blue]{faculty}[/blue].")
+    def scrap_course_plans(self, worker_count: int=MAX_THREAD_COUNT):
+        Logger.log_info("Scraping Course Programs")
+        t0 = perf_counter()  # Start the timer for logging.
 
-    # While splitting, make sure to have the plans of the same faculty be in the same chunk.
-    def split_programme_codes_into_chunks(self, programme_codes, num_chunks):
-        # Calculate the average chunk size and remainder
-        target_chunk_size = len(programme_codes) // num_chunks
-        
-        chunks = []
-        current_chunk = []
+        with open(PROGRAMME_CODES_FILE_PATH, "r", encoding="utf-8") as ordered_faculty_names:
+            programme_codes = [line.strip().split("|") for line in ordered_faculty_names.readlines()]
 
+        # Every programme is a unit of work, a programme unit adds a unit for each of its iterations to the same queue.
+        # Idle workers pick up whatever is next, so a big faculty doesn't leave a single thread behind.
+        unit_queue = queue.Queue()
         for programme_code, programme_name, faculty, programme_type in programme_codes:
-            is_chunk_full = len(current_chunk) >= target_chunk_size
-            belongs_to_same_faculty_with_last = len(current_chunk) > 0 and current_chunk[-1][2] == faculty
+            if "Yandal" in programme_name:
+                Logger.log_info("Skipping the course plan for [blue]%s[/blue] in [blue]%s[/blue] as it is a \"Yandal\" program.", programme_name, faculty)
+                continue
 
-            if is_chunk_full and not belongs_to_same_faculty_with_last:
-                chunks.append(current_chunk)
-                current_chunk = []
+            if programme_type not in COURSE_PLAN_URLS.keys():
+                Logger.log_error("Skipping the course plan for [blue]%s[/blue] in [blue]%s[/blue] as the programme type \"%s\" is unknown.", programme_name, faculty, programme_type)
+                continue
 
-            current_chunk.append((programme_code, programme_name, faculty, programme_type))
+            unit_queue.put(("programme", programme_code, programme_name, faculty, programme_type))
 
-        # If there are remaining items not added to chunks, add them.
-        if len(current_chunk) > 0 and len(chunks) > 0:
-            if len(chunks) < num_chunks:
-                chunks.append(current_chunk)
-            else:
-                chunks[-1].extend(current_chunk)
-        
-        return chunks
+        self.programme_iterations = {}
+        self.unit_timings = []
+        self.selective_course_futures = {}
+        self.selective_course_reference_count = 0
+        worker_count = max(1, worker_count)
+        workers = [
+            threading.Thread(target=self.course_plan_worker_routine, args=(unit_queue, i + 1)) for i in range(worker_count)
+        ]
+        t_units = perf_counter()
+        for t in workers: t.start()
 
-    def scrap_course_plans(self):
-        Logger.log_info("Scraping Course Programs")
-        t0 = perf_counter()  # Start the timer for logging.
+        # Programme units add more units, so wait for the queue itself to be drained before stopping the workers.
+        unit_queue.join()
+        for _ in workers: unit_queue.put(None)
+        for t in workers: t.join()
 
-        with open(PROGRAMME_CODES_FILE_PATH, "r", encoding="utf-8") as ordered_faculty_names:
-            programme_codes = [line.strip().split("|") for line in ordered_faculty_names.readlines()]
+        self.log_unit_timings(worker_count, perf_counter() - t_units)
+        self.assemble_faculty_course_plans(programme_codes)
+
+        if self.selective_course_executor is not None:
+            self.selective_course_executor.shutdown()
+            self.selective_course_executor = None
 
-        thread_count = min(MAX_THREAD_COUNT, len(programme_codes))
-        programme_code_chunks = self.split_programme_codes_into_chunks(programme_codes, thread_count)
-        thread_count = len(programme_code_chunks)
-
-        # Create the threads
-        threads = []
-        for i in range(thread_count):
-            t = threading.Thread(target=self.scrap_faculty_course_plans_routine, args=(programme_code_chunks[i], i + 1))
-            threads.append(t)
-        
-        # Start and wait for the threads to finish.
-        for t in threads: t.start()
-        for t in threads: t.join()
+        Logger.log_info(
+            f"Downloaded {len(self.selective_course_futures)} distinct selective course lists "
+            f"for {self.selective_course_reference_count} references."
+        )
 
         # Faculties
         ordered_faculty_names = [
@@ -0,0 +1,204 @@
+from tqdm import tqdm
+import os
+
+from logger import Logger
+from constants import *
+
+
+class CoursePlanFormat:
+    """
+    The grammar of course_plans.txt:
+
+        # <faculty>
+        ## <programme>
+        ### <iteration>
+        <semester>        (8 lines per iteration, empty lines for missing semesters)
+
+    A semester is its courses joined with "=", a selective course group is written as "[<title>*(<code>|<code>|...)]".
+    Parsed, a semester is a list of course codes and {title: [codes]} dicts, the same thing the scraper produces.
+    """
+
+    SEMESTER_COUNT = 8
+
+    @staticmethod
+    def parse_course(cell: str) -> str|dict[str, list[str]]:
+        if not (cell.startswith("[") and cell.endswith(")]") and "*(" in cell):
+            return cell
+
+        title, codes = cell[1:-2].rsplit("*(", 1)
+        return {title: codes.split("|") if codes else []}
+
+    @staticmethod
+    def parse_semester(line: str) -> list:
+        line = line.strip()
+        return [CoursePlanFormat.parse_course(cell) for cell in line.split("=")] if line else []
+
+    @staticmethod
+    def serialize_course(course: str|dict[str, list[str]]) -> str:
+        if type(course) is not dict:
+            return course
+
+        title, codes = next(iter(course.items()))
+        return f"[{title.replace(chr(10), '')}*({'|'.join([code.replace(chr(10), '') for code in codes])})]"
+
+    @staticmethod
+    def serialize_semester(semester: list) -> str:
+        # Dicts without a title can't be written, the old writer crashed on them.
+        return "=".join([CoursePlanFormat.serialize_course(course) for course in semester if course != {}])
+
+    @staticmethod
+    def get_course_codes(line: str) -> list[str]:
+        # Every course code in a semester line, including the ones in selective course groups.
+        course_codes = []
+        for course in CoursePlanFormat.parse_semester(line):
+            if type(course) is dict:
+                course_codes += next(iter(course.values()))
+            else:
+                course_codes.append(course)
+
+        return course_codes
+
+    @staticmethod
+    def serialize_plan(programme: str, iterations: dict[str, list], log_prefix: str="") -> str:
+        lines = [f"## {programme}\n"]
+        for iteration, semesters in iterations.items():
+            if semesters is None:
+                Logger.log_warning(f"Skipping the iteration \"{iteration}\" of \"{log_prefix}{programme}\", it couldn't be scraped.")
+                continue
+
+            lines.append(f"### {iteration}\n")
+            for i, semester in enumerate(semesters):
+                if any(type(course) is dict and course and not next(iter(course.values())) for course in semester):
+                    Logger.log_info(f"Empty selective course list found in {log_prefix}{programme} - {iteration} - {i + 1}. semester.")
+                lines.append(CoursePlanFormat.serialize_semester(semester) + "\n")
+
+            if len(semesters) < CoursePlanFormat.SEMESTER_COUNT:
+                lines.append("\n" * (CoursePlanFormat.SEMESTER_COUNT - len(semesters)))
+
+        return "".join(lines)
+
+
+class StoredPlan:
+    # A plan that's still in course_plans.txt, it's only read (and parsed) when needed.
+    def __init__(self, store, start: int, end: int, iterations: dict[str, tuple[int, int]]) -> None:
+        self.store = store
+        self.start, self.end = start, end
+        self.iterations = iterations  # iteration -> (start, end) byte offsets
+
+    def read_raw(self) -> bytes:
+        return self.store.read_range(self.start, self.end)
+
+    def load(self) -> dict[str, list]:
+        iterations = {}
+        for iteration, (start, end) in self.iterations.items():
+            lines = self.store.read_range(start, end).decode("utf-8").splitlines()[1:]  # Skip the "### " header.
+            semesters = [CoursePlanFormat.parse_semester(line) for line in lines if line.strip()]
+            iterations[iteration] = semesters[:CoursePlanFormat.SEMESTER_COUNT]
+
+        return iterations
+
+
+class CoursePlanStore:
+    """
+    Reads course_plans.txt through a byte offset index of its headers, a plan is only read when it's asked for.
+
+    faculties maps faculty -> {programme -> StoredPlan}, in file order. The file is kept open until close is called.
+    """
+
+    def __init__(self, file_path: str=COURSE_PLANS_FILE_PATH) -> None:
+        self.file_path = file_path
+        self.file = None
+        self.faculties = {}
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def open(self) -> None:
+        self.faculties = {}
+        if not os.path.exists(self.file_path):
+            return
+
+        self.file = open(self.file_path, "rb")
+        self.build_index()
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def build_index(self) -> None:
+        plan, iteration_name, iteration_start = None, None, 0
+        offset = 0
+
+        def close_iteration(end: int) -> None:
+            if plan is not None and iteration_name is not None:
+                plan.iterations[iteration_name] = (iteration_start, end)
+
+        def close_plan(end: int) -> None:
+            close_iteration(end)
+            if plan is not None:
+                plan.end = end
+
+        current_faculty = None
+        for line in self.file:
+            if line.startswith(b"### "):
+                close_iteration(offset)
+                iteration_name, iteration_start = line[4:].decode("utf-8").strip(), offset
+            elif line.startswith(b"## "):
+                close_plan(offset)
+                iteration_name = None
+                plan = StoredPlan(self, offset, offset, {})
+                if current_faculty is not None:
+                    self.faculties[current_faculty][line[3:].decode("utf-8").strip()] = plan
+            elif line.startswith(b"# "):
+                close_plan(offset)
+                plan, iteration_name = None, None
+                current_faculty = line[2:].decode("utf-8").strip()
+                self.faculties[current_faculty] = {}
+
+            offset += len(line)
+
+        close_plan(offset)
+
+    def read_range(self, start: int, end: int) -> bytes:
+        self.file.seek(start)
+        return self.file.read(end - start)
+
+    def get_plan(self, faculty: str, programme: str) -> StoredPlan|None:
+        return self.faculties.get(faculty, {}).get(programme)
+
+    def write(self, faculty_course_plans: dict) -> dict[str, int]:
+        """
+        Writes faculty -> programme -> plan to file_path, a plan is either a StoredPlan which is copied as is or
+        iteration -> semesters which is serialized. The old file may still be open, it's replaced once writing is done.
+        Returns how many plans were copied, and how many of the serialized ones changed or stayed the same.
+        """
+        counts = {"copied": 0, "changed": 0, "unchanged": 0}
+        tmp_path = f"{self.file_path}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                faculties_tqdm = tqdm(faculty_course_plans.keys())
+                for faculty in faculties_tqdm:
+                    faculties_tqdm.set_description(f"Saving Course Plans of \"{faculty}\"")
+                    f.write(f"# {faculty}\n".encode("utf-8"))
+                    for programme, plan in faculty_course_plans[faculty].items():
+                        if isinstance(plan, StoredPlan):
+                            f.write(plan.read_raw())
+                            counts["copied"] += 1
+                            continue
+
+                        plan_bytes = CoursePlanFormat.serialize_plan(programme, plan, f"{faculty} - ").encode("utf-8")
+                        stored_plan = self.get_plan(faculty, programme) if self.file is not None else None
+                        counts["unchanged" if stored_plan and stored_plan.read_raw() == plan_bytes else "changed"] += 1
+                        f.write(plan_bytes)
+
+            os.replace(tmp_path, self.file_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        return counts
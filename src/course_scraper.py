@@ -1,411 +1,441 @@
+from hashlib import sha1
 from os import path
+import json
 import re
-from selenium.webdriver.support import expected_conditions as EC
-import requests
 from bs4 import BeautifulSoup
 from logger import Logger
 from constants import *
-from time import sleep
 import threading
+import queue
 
 from scraper import Scraper
+from async_fetcher import AsyncFetcher
+from http_client import HttpClient, ConcurrencyLimiter
+from http_cache import HttpCache
+from html_parser import HtmlParser
+from reconciler import Reconciler
+from metrics import Metrics
+from course_code_index import CourseCodeIndex
+
+
+TAG_PATTERN = re.compile(r"<.*?>")
+HORIZONTAL_SPACE_PATTERN = re.compile(r"[ \t]+")
+LINE_BREAK_PATTERN = re.compile(r"[\r\n\u2028\u2029]+")
+UNICODE_SPACE_PATTERN = re.compile(r"[\t\xa0\u00a0\u1680\u2000-\u200a\u202f\u205f\u3000]+")
+WHITESPACE_PATTERN = re.compile(r"\s+")
 
 
 class CourseScraper(Scraper):
-    def __init__(self, webdriver):
+    def __init__(self, webdriver, incremental: bool=False):
         super().__init__(webdriver)
-        self.courses = []
+
+        # Scraped rows are passed to the consumer of iter_courses through this queue as soon as they are ready.
+        self.course_queue = None
+        self.scraping_error = None  # Raised by iter_courses if the scraping thread failed.
+        self.reconciler = Reconciler("course")
+        self.course_count = 0
+        self.course_count_lock = threading.Lock()
+
+        # Incremental mode, courses whose page didn't change since the last run are not parsed again.
+        self.incremental = incremental
+        self.fingerprints = {}
+        self.previous_rows = {}
+        self.change_counts = {"added": 0, "changed": 0, "unchanged": 0}
+        self.fingerprints_lock = threading.Lock()
 
     def get_course_codes(self):
-        course_codes = []
-
-        # Read the lessons file
-        if path.exists(LESSONS_FILE_PATH):
-            with open(LESSONS_FILE_PATH, "r") as file:
-                course_codes += [l.split("|")[1] for l in file.readlines() if "|" in l]
-
-        # Read the course plans file
-        if path.exists(COURSE_PLANS_FILE_PATH):
-            with open(COURSE_PLANS_FILE_PATH, "r") as file:
-                course_rows = [l.replace("\n", "") for l in file.readlines() if l[0] != "#"]
-                for cells in [row.split("=") for row in course_rows]:
-                    for cell in cells:
-                        # If elective course
-                        if "[" in cell:
-                            course_codes += cell.split("*")[-1].replace("(", "").replace(")", "").replace("]", "").split("|")
-                        else:
-                            course_codes.append(cell)
-
-        # Read the old courses files
-        if path.exists(COURSES_FILE_PATH):
-            with open(COURSES_FILE_PATH, "r", encoding="utf-8") as file:
-                course_codes += [l.split("|")[0] for l in file.readlines() if "|" in l]
+        # The index only parses the files that changed since the last run, newly referenced codes come first.
+        course_code_index = CourseCodeIndex()
+        course_code_index.update()
+        if course_code_index.new_codes:
+            Logger.log_info(f"Found {len(course_code_index.new_codes)} newly referenced course codes.")
 
-        return list(set([c.strip() for c in course_codes if len(c.strip()) > 0]))  # Remove duplicates and empty strings.
+        return course_code_index.get_course_codes()
 
-    def scrap_table_html(self, source: str, course_code: str, timeout_dur: float=3.0, max_retries: int=5, log_prefix: str="") -> str|None:
+    def build_table_index(self, soup: BeautifulSoup) -> list[tuple[str, object, bool]]:
         """
-        Parse course HTML and return cleaned pipe-delimited course info.
+        Walk the tables of a course page once and return (header text, table, has no thead) triplets in document order.
 
-        source can be either a Selenium WebDriver (old behaviour) or an HTML string (preferred).
+        The header is the table's first <th> inside <thead>, falling back to the first cell of the first row.
         """
-        html = source
-        attempt = 0
-        while attempt < max_retries:
-            if attempt > 0:
-                Logger.log_warning(f"{log_prefix} Retrying scrap_current_table for {course_code}, attempt {attempt+1}/{max_retries}")
+        table_index = []
+        # All the tables in the page are also wrapped in a table and it's the first table so skip it.
+        for table in soup.find_all('table')[1:]:
             try:
-                soup = BeautifulSoup(html, 'html.parser')
-
-                # Helper to find a table by inspecting each <table>'s header
-                # Match is performed against the table's first <th> inside <thead> (fallbacks applied).
-                # Returns tbody <td> values as a 2D list of strings (each row is a list of td contents).
-                def get_table(first_header: str) -> list[list[str]]:
-                    try:
-                        # All the tables in the page are also wrapped in a table and it's the first table so skipt it.
-                        tables = soup.find_all('table')[1:]
-                        for table in tables:
-                            try:
-                                # Try to get header text from thead > tr > th
-                                header_text = ""
-                                no_thead = False
-                                thead = table.find('thead')
-                                if thead:
-                                    first_th = thead.find('tr')
-                                    if first_th:
-                                        first_th = first_th.find('th')
-                                        if first_th:
-                                            header_text = first_th.get_text(strip=True)
-
-                                # Fallback: if no thead or th, try first row's first cell (could be th or td)
-                                if not header_text:
-                                    first_row = table.find('tr')
-                                    if first_row:
-                                        first_cell = first_row.find(['th', 'td'])
-                                        if first_cell:
-                                            header_text = first_cell.get_text(strip=True)
-                                            no_thead = True
-
-                                if first_header in header_text:
-                                    # Collect tbody rows' td values
-                                    tbody = table.find('tbody') or table
-                                    table_rows = []
-                                    rows = tbody.find_all('tr')[1:] if no_thead else tbody.find_all('tr')
-                                    for tr in rows:
-                                        tds = tr.find_all('td')
-                                        row_vals = [td.decode_contents().replace('\n', '').strip() for td in tds]
-                                        table_rows.append(row_vals)
-                                    return table_rows
-                            except Exception as e:
-                                Logger.log_error(f"get_table inner error: {e}")
-                                continue
-                    except Exception as e:
-                        Logger.log_error(f"get_table outer error: {e}")
-                        pass
-                    return []
-
-                course_details_table = get_table("Ders Kodu")
-                if not course_details_table:
-                    raise Exception("No course details table found")
-        
-                course_code_text = course_details_table[0][0]
-                course_name_text = course_details_table[0][1]
-                course_lang_text = course_details_table[0][2]
-
-                # Remove tags but keep inner text later when cleaning
-                # This means there are 2 course
-                if "-" in course_code_text and len(course_code_text) > 1:
-                    course_codes = [c.strip() for c in re.sub('<.*?>', '', course_code_text).split("-")]
-                    course_index = -1
-                    for idx, code in enumerate(course_codes):
-                        if course_code in code:
-                            course_index = idx
-                            break
-
-                    if course_index >= 0:
-                        course_code_text = course_codes[course_index]
-                        
-                        splitted_course_name_text = re.sub('<.*?>', '', course_name_text).split('/')
-                        course_name_text = splitted_course_name_text[min(course_index, len(splitted_course_name_text) - 1)].strip()
-                        
-                        splitted_course_lang_text = re.sub('<.*?>', '', course_lang_text).split('/')
-                        course_lang_text = splitted_course_lang_text[min(course_index, len(splitted_course_lang_text) - 1)].strip()
-
-                # Sometimes, there is a single name yet name in multiple languages.
-                if "/" in course_name_text:
-                    course_lang_text = course_lang_text.split("/")[0].strip()
-
-                    course_names = course_name_text.split("/")
-                    course_name_text = course_names[min(0 if "Türkçe" in course_lang_text else 1, len(course_names) - 1)].strip()
-
-                # Convert "MAT103E" to "MAT 103E"
-                course_code_text_plain = re.sub('<.*?>', '', course_code_text)
-                if " " not in course_code_text_plain and len(course_code_text_plain) > 3:
-                    if "TB001" in course_code_text_plain:
-                        course_code_text_plain = course_code_text_plain[:2] + " " + course_code_text_plain[2:]
-                    else:
-                        course_code_text_plain = course_code_text_plain[:3] + " " + course_code_text_plain[3:]
-
-                output = ""
-                output += course_code_text_plain + "|"  # Course Code
-                output += re.sub('<.*?>', '', course_name_text) + "|"  # Course Name
-                output += re.sub('<.*?>', '', course_lang_text) + "|"  # Course Language
-
-                credits_table = get_table("Kredi")
-                if credits_table and len(credits_table) > 0 and len(credits_table[0]) > 1:
-                    output += re.sub('<.*?>', '', credits_table[0][0].replace(",", ".")) + "|"  # Course Credits
-                    output += re.sub('<.*?>', '', credits_table[0][1].replace(",", ".")) + "|"  # Course ECTS
-                else:
-                    output += "||"
-
-                # Use get_table to find tables by their first <td> header inside a <tbody>
-                desc_text = ""
-                course_prereqs = ""
-                major_prereqs = ""
-
-                # Description table: look for a tbody whose first cell contains 'Ders Tanımı'
-                desc_table = get_table("Ders Tanımı")
-                if desc_table and len(desc_table) > 0 and len(desc_table[0]) > 0:
-                    try:
-                        desc_text = desc_table[0][0]
-                    except Exception:
-                        desc_text = ""
-
-                # Prerequisites table: look for a tbody whose first cell contains 'Önşartlar'
-                prereq_table = get_table("Önşartlar")
-                if prereq_table and len(prereq_table) > 0 and len(prereq_table[0]) > 1:
-                    # course_prereqs is expected at row index 1, td index 1
-                    try:
-                        course_prereqs = prereq_table[0][1] if len(prereq_table[0]) > 1 else ""
-                    except Exception:
-                        course_prereqs = ""
-                if prereq_table and len(prereq_table) > 1:
-                    try:
-                        major_prereqs = prereq_table[1][1] if len(prereq_table[1]) > 1 else ""
-                    except Exception:
-                        major_prereqs = ""
-
-                output += course_prereqs.replace("\n", "").replace("Veya", "veya").replace("Ve", "ve") + "|"  # Course Prerequisites
-                output += major_prereqs.replace("\n", "") + "|"  # Major Prerequisites
-                output += desc_text.replace("\n", "")  # Description
-
-                # Clean output - Thx Claude
-                text = re.sub(r"[ \t]+", " ", re.sub(r"<.*?>", "", output)).replace("\n", " ").strip()
-                text = re.sub(r"[\r\n\u2028\u2029]+", " ", text)  # Line breaks
-                text = re.sub(r"[\t\xa0\u00a0\u1680\u2000-\u200a\u202f\u205f\u3000]+", " ", text)  # Various whitespace
-                text = re.sub(r"\s+", " ", text)  # Normalize any remaining whitespace
-                return text
+                # Try to get header text from thead > tr > th
+                header_text = ""
+                no_thead = False
+                thead = table.find('thead')
+                if thead:
+                    first_th = thead.find('tr')
+                    if first_th:
+                        first_th = first_th.find('th')
+                        if first_th:
+                            header_text = first_th.get_text(strip=True)
+
+                # Fallback: if no thead or th, try first row's first cell (could be th or td)
+                if not header_text:
+                    first_row = table.find('tr')
+                    if first_row:
+                        first_cell = first_row.find(['th', 'td'])
+                        if first_cell:
+                            header_text = first_cell.get_text(strip=True)
+                            no_thead = True
+
+                table_index.append((header_text, table, no_thead))
             except Exception as e:
-                Logger.log_error(f"{log_prefix} scrap_current_table failed for {course_code}:\n{e}")
+                Logger.log_error(f"build_table_index error: {e}")
+
+        return table_index
+
+    def scrap_table_html(self, source: str, course_code: str, log_prefix: str="") -> str|None:
+        """
+        Parse course HTML and return cleaned pipe-delimited course info.
+
+        source is the HTML string returned by the course API. The input is static, so a failed parse is not retried.
+        """
+        try:
+            soup = HtmlParser.make_soup(source)
+            table_index = self.build_table_index(soup)
+            table_rows_cache = {}
+
+            # Returns tbody <td> values of the first table whose header contains first_header as a 2D list of strings
+            # (each row is a list of td contents).
+            def get_table(first_header: str) -> list[list[str]]:
+                for i, (header_text, table, no_thead) in enumerate(table_index):
+                    if first_header not in header_text:
+                        continue
+
+                    if i not in table_rows_cache:
+                        # Collect tbody rows' td values
+                        tbody = table.find('tbody') or table
+                        rows = tbody.find_all('tr')[1:] if no_thead else tbody.find_all('tr')
+                        table_rows_cache[i] = [
+                            [td.decode_contents().replace('\n', '').strip() for td in tr.find_all('td')] for tr in rows
+                        ]
+                    return table_rows_cache[i]
+                return []
+
+            course_details_table = get_table("Ders Kodu")
+            if not course_details_table:
+                raise Exception("No course details table found")
+
+            course_code_text = course_details_table[0][0]
+            course_name_text = course_details_table[0][1]
+            course_lang_text = course_details_table[0][2]
+
+            # Remove tags but keep inner text later when cleaning
+            # This means there are 2 course
+            if "-" in course_code_text and len(course_code_text) > 1:
+                course_codes = [c.strip() for c in TAG_PATTERN.sub('', course_code_text).split("-")]
+                course_index = -1
+                for idx, code in enumerate(course_codes):
+                    if course_code in code:
+                        course_index = idx
+                        break
+
+                if course_index >= 0:
+                    course_code_text = course_codes[course_index]
+
+                    splitted_course_name_text = TAG_PATTERN.sub('', course_name_text).split('/')
+                    course_name_text = splitted_course_name_text[min(course_index, len(splitted_course_name_text) - 1)].strip()
+
+                    splitted_course_lang_text = TAG_PATTERN.sub('', course_lang_text).split('/')
+                    course_lang_text = splitted_course_lang_text[min(course_index, len(splitted_course_lang_text) - 1)].strip()
+
+            # Sometimes, there is a single name yet name in multiple languages.
+            if "/" in course_name_text:
+                course_lang_text = course_lang_text.split("/")[0].strip()
+
+                course_names = course_name_text.split("/")
+                course_name_text = course_names[min(0 if "Türkçe" in course_lang_text else 1, len(course_names) - 1)].strip()
+
+            # Convert "MAT103E" to "MAT 103E"
+            course_code_text_plain = TAG_PATTERN.sub('', course_code_text)
+            if " " not in course_code_text_plain and len(course_code_text_plain) > 3:
+                if "TB001" in course_code_text_plain:
+                    course_code_text_plain = course_code_text_plain[:2] + " " + course_code_text_plain[2:]
+                else:
+                    course_code_text_plain = course_code_text_plain[:3] + " " + course_code_text_plain[3:]
+
+            output = ""
+            output += course_code_text_plain + "|"  # Course Code
+            output += TAG_PATTERN.sub('', course_name_text) + "|"  # Course Name
+            output += TAG_PATTERN.sub('', course_lang_text) + "|"  # Course Language
+
+            credits_table = get_table("Kredi")
+            if credits_table and len(credits_table) > 0 and len(credits_table[0]) > 1:
+                output += TAG_PATTERN.sub('', credits_table[0][0].replace(",", ".")) + "|"  # Course Credits
+                output += TAG_PATTERN.sub('', credits_table[0][1].replace(",", ".")) + "|"  # Course ECTS
+            else:
+                output += "||"
+
+            desc_text = ""
+            course_prereqs = ""
+            major_prereqs = ""
+
+            # Description table: look for a table whose first cell contains 'Ders Tanımı'
+            desc_table = get_table("Ders Tanımı")
+            if desc_table and len(desc_table[0]) > 0:
+                desc_text = desc_table[0][0]
+
+            # Prerequisites table: look for a table whose first cell contains 'Önşartlar'
+            prereq_table = get_table("Önşartlar")
+            if prereq_table and len(prereq_table[0]) > 1:
+                course_prereqs = prereq_table[0][1]
+            if len(prereq_table) > 1 and len(prereq_table[1]) > 1:
+                major_prereqs = prereq_table[1][1]
+
+            output += course_prereqs.replace("\n", "").replace("Veya", "veya").replace("Ve", "ve") + "|"  # Course Prerequisites
+            output += major_prereqs.replace("\n", "") + "|"  # Major Prerequisites
+            output += desc_text.replace("\n", "")  # Description
+
+            # Clean output - Thx Claude
+            text = HORIZONTAL_SPACE_PATTERN.sub(" ", TAG_PATTERN.sub("", output)).replace("\n", " ").strip()
+            text = LINE_BREAK_PATTERN.sub(" ", text)  # Line breaks
+            text = UNICODE_SPACE_PATTERN.sub(" ", text)  # Various whitespace
+            text = WHITESPACE_PATTERN.sub(" ", text)  # Normalize any remaining whitespace
+            return text
+        except Exception as e:
+            Logger.log_error("%s scrap_table_html failed for %s:\n%s", log_prefix, course_code, e)
 
-            attempt += 1
-        Logger.log_error(f"{log_prefix} scrap_current_table failed after retries.")
         return None
 
-    # def scrap_current_table(self, driver, course_code: str, timeout_dur: float=3.0, max_retries: int=5, log_prefix: str="") -> str|None:
-    #     """Original selenium-based implementation extracted to keep compatibility."""
-    #     output = ""
-    #     attempt = 0
-    #     while attempt < max_retries:
-    #         if attempt > 0:
-    #             Logger.log_warning(f"{log_prefix} Retrying scrap_current_table for {course_code}, attempt {attempt+1}/{max_retries}")
-    #         try:
-    #             all_rows = WebDriverWait(driver, timeout_dur).until(
-    #                 EC.presence_of_all_elements_located((By.CSS_SELECTOR, "tbody tr"))
-    #             )
-
-    #             def get_cell(row_idx, col_idx):
-    #                 tds = self.find_elements_by_css_selector("td", all_rows[row_idx])
-    #                 return tds[col_idx].get_attribute("innerHTML").replace("\n", " ")
-
-    #             course_code_text = get_cell(2, 0)
-    #             course_name_text = get_cell(2, 1)
-    #             course_lang_text = get_cell(2, 2)
-
-    #             # This means there are 2 course
-    #             if "-" in course_code_text and len(course_code_text) > 1:
-    #                 course_codes = [c.strip() for c in course_code_text.split("-")]
-    #                 course_index = -1
-    #                 for idx, code in enumerate(course_codes):
-    #                     if course_code in code:
-    #                         course_index = idx
-    #                         break
-
-    #                 course_code_text = course_codes[course_index]
-
-    #                 # For some fucking reason these are split with / when there are 2 courses instead of - like the course code.
-    #                 course_name_text = course_name_text.split("/")[course_index].strip()
-    #                 course_lang_text = course_lang_text.split("/")[course_index].strip()
-
-    #             # Sometimes, there is a single name yet name in multiple languages.
-    #             if "/" in course_name_text:
-    #                 course_lang_text = course_lang_text.split("/")[0].strip()  # In this case, there must be a single language but just in case.
-    #                 course_name_text = course_name_text.split("/")[0 if "Türkçe" in course_lang_text else 1].strip()
-
-
-    #             # Convert "MAT103E" to "MAT 103E"
-    #             if " " not in course_code_text and len(course_code_text) > 3:
-    #                 course_code_text = course_code_text[:3] + " " + course_code_text[3:]
-
-    #             output += course_code_text + "|"  # Course Code
-    #             output += course_name_text + "|"  # Course Name
-    #             output += course_lang_text + "|"  # Course Language
-
-    #             output += get_cell(4, 0) + "|"  # Course Credits
-    #             output += get_cell(4, 1) + "|"  # Course ECTS
-
-    #             # These fields are dynamic so hardcoded indexes dont work. FAAAK
-    #             tables = WebDriverWait(driver, timeout_dur).until(
-    #                 EC.presence_of_all_elements_located((By.CSS_SELECTOR, "table"))
-    #             )[1:] # First one is used as a parent to all the other tables.
-
-    #             desc_text = ""
-    #             course_prereqs = ""
-    #             major_prereqs = ""
-    #             for table in tables:
-    #                 try:
-    #                     first_row = table.find_elements(By.CSS_SELECTOR, "tr")[0]
-    #                     first_cell = first_row.find_elements(By.CSS_SELECTOR, "td")[0].text.strip()
-    #                 except Exception:
-    #                     continue
-
-    #                 if "Ders Tanımı" in first_cell:
-    #                     # Description table: get all text from 2nd row, 1st cell
-    #                     desc_text = table.find_elements(By.CSS_SELECTOR, "tr")[1].find_elements(By.CSS_SELECTOR, "td")[0].get_attribute("innerHTML").replace("\n", "")
-    #                 elif "Önşartlar" in first_cell:
-    #                     course_prereqs = table.find_elements(By.CSS_SELECTOR, "tr")[1].find_elements(By.CSS_SELECTOR, "td")[1].get_attribute("innerHTML")
-    #                     major_prereqs = table.find_elements(By.CSS_SELECTOR, "tr")[2].find_elements(By.CSS_SELECTOR, "td")[1].get_attribute("innerHTML")
-
-    #             output += course_prereqs.replace("\n", "").replace("Veya", "veya").replace("ve", "ve") + "|"  # Course Prerequisites
-    #             output += major_prereqs.replace("\n", "") + "|"  # Major Prerequisites
-    #             output += desc_text.replace("\n", "")  # Description
-
-    #             # Clean output - Thx Claude
-    #             text = re.sub(r"[ \t]+", " ", re.sub(r"<.*?>", "", output)).replace("\n", " ").strip()
-    #             text = re.sub(r"[\r\n\u2028\u2029]+", " ", text)  # Line breaks
-    #             text = re.sub(r"[\t\xa0\u00a0\u1680\u2000-\u200a\u202f\u205f\u3000]+", " ", text)  # Various whitespace
-    #             text = re.sub(r"\s+", " ", text)  # Normalize any remaining whitespace
-    #             return text
-    #         except UnexpectedAlertPresentException as e:
-    #             Logger.log_error(f"{log_prefix} (attempt {attempt+1}/{max_retries}) | Unexpected alert present, dismissing it.")
-    #             self.dismiss_alert(driver)
-    #         except Exception as e:
-    #             pass
-                        
-    #         sleep(0.5)
-    #         attempt += 1
-    #     Logger.log_error(f"{log_prefix} scrap_current_table failed after retries.")
-    #     return None
+    def get_course_api_url(self, name: str, number: str) -> str:
+        # Some course number suffixes are not accepted by the API
+        api_friendly_number = number
+        if api_friendly_number.endswith("T"):
+            api_friendly_number = api_friendly_number[:-1]
+        if api_friendly_number.endswith("CO"):
+            api_friendly_number = api_friendly_number[:-2]
+        if api_friendly_number.endswith("ES"):
+            api_friendly_number = api_friendly_number[:-2]
+        if api_friendly_number.endswith("SC"):
+            api_friendly_number = api_friendly_number[:-2]
+
+        return COURSES_API_URL.format(name, api_friendly_number)
+
+    def get_html_fingerprint(self, html: str) -> str:
+        # Anti-forgery tokens change on every request even if the page doesn't, they are removed before fingerprinting.
+        html = HttpCache.strip_volatile_content(html.encode("utf-8")).decode("utf-8")
+        normalized_html = WHITESPACE_PATTERN.sub(" ", html).strip()
+        return sha1(normalized_html.encode("utf-8")).hexdigest()
+
+    def load_fingerprints(self) -> None:
+        self.fingerprints, self.previous_rows = {}, {}
+
+        if path.exists(COURSE_FINGERPRINTS_FILE_PATH):
+            try:
+                with open(COURSE_FINGERPRINTS_FILE_PATH, "r", encoding="utf-8") as file:
+                    self.fingerprints = json.load(file)
+            except ValueError as e:
+                Logger.log_warning(f"Could not read the course fingerprints, all courses will be parsed: {e}")
+
+        if path.exists(COURSES_FILE_PATH):
+            with open(COURSES_FILE_PATH, "r", encoding="utf-8") as file:
+                for line in file:
+                    line = line.strip()
+                    if line and "|" in line:
+                        self.previous_rows[line.split("|")[0].strip()] = line
+
+    def save_fingerprints(self) -> None:
+        # Should be called after the courses file is saved, otherwise the fingerprints might point to rows that
+        # don't exist in the file yet.
+        if not self.incremental:
+            return
+
+        with open(COURSE_FINGERPRINTS_FILE_PATH, "w", encoding="utf-8") as file:
+            json.dump(self.fingerprints, file, ensure_ascii=False, sort_keys=True, indent=0)
+
+    def try_reuse_previous_row(self, course_code: str, fingerprint: str) -> str|None:
+        entry = self.fingerprints.get(course_code)
+        if entry is None or entry["hash"] != fingerprint or entry["row_code"] not in self.previous_rows:
+            return None
+
+        row = self.previous_rows[entry["row_code"]]
+        self.add_course_row(row)
+        with self.fingerprints_lock:
+            self.change_counts["unchanged"] += 1
+        return row
+
+    def update_fingerprint(self, course_code: str, fingerprint: str, row: str) -> None:
+        with self.fingerprints_lock:
+            self.change_counts["changed" if course_code in self.fingerprints else "added"] += 1
+            self.fingerprints[course_code] = {"hash": fingerprint, "row_code": row.split("|")[0].strip()}
+
+    def process_course_html(self, html: str, name: str, number: str, log_prefix: str, log_interval_modulo: int=100) -> str|None:
+        # Returns the row of the course, None if it couldn't be scraped.
+        course_code = f"{name} {number}"
+        fingerprint = None
+        if self.incremental:
+            fingerprint = self.get_html_fingerprint(html)
+            if (row := self.try_reuse_previous_row(course_code, fingerprint)) is not None:
+                return row
+
+        Logger.log_info("%s Scrapping \"%s %s\"", log_prefix, name, number)
+        with Metrics.stage("normalize"):
+            table_content = self.scrap_table_html(html, f"{name}{number}", log_prefix=log_prefix)
+        if table_content is not None:
+            Logger.log_info("%s [bright_green]Scraped \"%s %s\"[/bright_green]", log_prefix, name, number)
+            course_count = self.add_course_row(table_content)
+            if fingerprint is not None:
+                self.update_fingerprint(course_code, fingerprint, table_content)
+
+            if course_count % log_interval_modulo == 0:
+                Logger.log_info("Scraped %s courses in total.", course_count)
+        else:
+            Logger.log_error("%s [red]Could not scrape \"%s %s\"[/red]", log_prefix, name, number)
+
+        return table_content
 
     def scrap_courses_thread_routine(self, course_codes: list[str], thread_prefix: str, log_interval_modulo: int=100) -> None:
-        # Use requests to call the public API endpoint for each course and parse the returned HTML
-        session = requests.Session()
-        # A small timeout and retry logic per course
+        # Use the shared HTTP client to call the public API endpoint for each course and parse the returned HTML,
+        # retries are handled by the client.
         for name, number in [c.split(" ") for c in course_codes]:
             course_id = f"{name}{number}"
-
-            # Some course number suffixes are not accepted by the API
-            api_friendly_number = number
-            if api_friendly_number.endswith("T"):
-                api_friendly_number = api_friendly_number[:-1]
-            if api_friendly_number.endswith("CO"):
-                api_friendly_number = api_friendly_number[:-2]
-            if api_friendly_number.endswith("ES"):
-                api_friendly_number = api_friendly_number[:-2]
-            if api_friendly_number.endswith("SC"):
-                api_friendly_number = api_friendly_number[:-2]
-
-            api_url = COURSES_API_URL.format(name, api_friendly_number)
+            api_url = self.get_course_api_url(name, number)
 
             html = None
-            attempts = 0
-            while attempts < 3:
-                try:
-                    resp = session.get(api_url, timeout=10)
-                    if resp.status_code == 200 and resp.text:
-                        html = resp.text
-                        break
-                    else:
-                        Logger.log_warning(f"{thread_prefix} Non-200 response {resp.status_code} for {course_id}")
-                except Exception as e:
-                    Logger.log_warning(f"{thread_prefix} Error fetching {course_id}: {e}")
-                attempts += 1
-                sleep(0.5)
+            try:
+                resp = HttpClient.get(api_url, timeout=10)
+                if resp.status_code == 200 and resp.text:
+                    html = resp.text
+                else:
+                    Logger.log_warning("%s Non-200 response %s for %s", thread_prefix, resp.status_code, course_id)
+            except Exception as e:
+                Logger.log_warning("%s Error fetching %s: %s", thread_prefix, course_id, e)
 
             if not html:
-                Logger.log_error(f"{thread_prefix} [red]Could not fetch HTML for \"{name} {number}\"[/red]")
+                Logger.log_error("%s [red]Could not fetch HTML for \"%s %s\"[/red]", thread_prefix, name, number)
                 continue
 
-            Logger.log_info(f"{thread_prefix} Scrapping \"{name} {number}\"")
-            table_content = self.scrap_table_html(html, course_id, log_prefix=thread_prefix)
-            if table_content is not None:
-                Logger.log_info(f"{thread_prefix} [bright_green]Scraped \"{name} {number}\"[/bright_green]")
-                self.courses.append(table_content)
-
-                if len(self.courses) % log_interval_modulo == 0:
-                    Logger.log_info(f"Scraped {len(self.courses)} courses in total.")
-            else:
-                Logger.log_error(f"{thread_prefix} [red]Could not scrape \"{name} {number}\"[/red]")
+            self.process_course_html(html, name, number, thread_prefix, log_interval_modulo)
 
         Logger.log(f"{thread_prefix} [bright_green]Operation completed.[/bright_green]")
 
+    def scrap_courses_async(self, course_codes: list[str], concurrency: int) -> None:
+        prefix = "[royal_blue1][Async][/royal_blue1]"
+
+        items = [(c, self.get_course_api_url(*c.split(" "))) for c in course_codes]
+        course_codes_by_url = {api_url: course_code for course_code, api_url in items}
+
+        def fetch(api_url: str) -> str|None:
+            # Parsing is done here too, on the fetcher's threads, so the event loop is never blocked by BeautifulSoup.
+            resp = HttpClient.get(api_url, timeout=10)
+            if resp.status_code != 200 or not resp.text:
+                Logger.log_warning("%s Non-200 response %s for %s", prefix, resp.status_code, api_url)
+                return None
+
+            name, number = course_codes_by_url[api_url].split(" ")
+            return self.process_course_html(resp.text, name, number, prefix)
+
+        def on_result(course_code: str, row: str|None) -> None:
+            if row is None:
+                Logger.log_error("%s [red]Gave up on \"%s\"[/red]", prefix, course_code)
+
+        # HttpClient already retries the failed requests with a backoff, retrying them here too would multiply them.
+        fetcher = AsyncFetcher(
+            fetch, concurrency=concurrency, requests_per_second=REQUESTS_PER_SECOND_PER_HOST, max_retries=1,
+            log_prefix=prefix,
+        )
+        fetcher.run(items, on_result)
+
+        Logger.log(f"{prefix} [bright_green]Operation completed.[/bright_green]")
+
     def split_list_into_chunks(self, lst, num_chunks):
-        # Calculate the average chunk size and remainder
-        chunk_size = len(lst) // num_chunks
-        remainder = len(lst) % num_chunks
-        
-        # Initialize the chunks
-        chunks = []
-        start = 0
-        
-        for i in range(num_chunks):
-            # If there's remainder, increase the chunk size for this chunk
-            end = start + chunk_size + (1 if i < remainder else 0)
-            chunks.append(lst[start:end])
-            start = end
-        
-        return chunks
-
-    def scrap_courses(self):
-        Logger.log_info("====== Scraping All Courses ======")
+        # Deal the items out round-robin, so the items at the front of the list are started first by every thread.
+        return [lst[i::num_chunks] for i in range(num_chunks)]
+
+    def add_course_row(self, row: str) -> int:
+        with self.course_count_lock:
+            self.reconciler.mark_fresh(row.split("|", 1)[0])
+            self.course_count += 1
+            course_count = self.course_count
+
+        self.course_queue.put(row)
+        return course_count
 
-        self.courses = []
-        Logger.log_info("Finding course codes to scrap.")
-        courses_to_scrap = sorted(self.get_course_codes())
-        Logger.log_info(f"Found {len(courses_to_scrap)} courses to scrap.")
-        
-        chunks = self.split_list_into_chunks(courses_to_scrap, MAX_THREAD_COUNT)
-        threads = []
-        for i in range(MAX_THREAD_COUNT):
-            prefix = f"[royal_blue1][Thread {str(i).zfill(2)}][/royal_blue1]"
-            t = threading.Thread(target=self.scrap_courses_thread_routine, args=(chunks[i], prefix))
-            threads.append(t)
-        
-        # Start and wait for the threads to finish.
-        for t in threads: t.start()
-        for t in threads: t.join()
-
-        Logger.log_info("[bold green]Scraping all courses is completed.[/bold green]")
+    def scrap_courses_routine(self, fetch_mode: str, concurrency: int) -> None:
+        try:
+            if self.incremental:
+                self.load_fingerprints()
+                self.change_counts = {"added": 0, "changed": 0, "unchanged": 0}
+
+            Logger.log_info("Finding course codes to scrap.")
+            courses_to_scrap = self.get_course_codes()
+            Logger.log_info(f"Found {len(courses_to_scrap)} courses to scrap.")
 
+            if fetch_mode == "async":
+                self.scrap_courses_async(courses_to_scrap, concurrency)
+            else:
+                # The concurrency limiter decides how many of the threads are fetching at a time.
+                thread_count = ConcurrencyLimiter.get_worker_count()
+                chunks = self.split_list_into_chunks(courses_to_scrap, thread_count)
+                threads = []
+                for i in range(thread_count):
+                    prefix = f"[royal_blue1][Thread {str(i).zfill(2)}][/royal_blue1]"
+                    t = threading.Thread(target=self.scrap_courses_thread_routine, args=(chunks[i], prefix))
+                    threads.append(t)
+
+                # Start and wait for the threads to finish.
+                for t in threads: t.start()
+                for t in threads: t.join()
+
+            Logger.log_info("[bold green]Scraping all courses is completed.[/bold green]")
+            if self.incremental:
+                Logger.log_info(
+                    f"Incremental refresh: [green]{self.change_counts['added']}[/green] added, "
+                    f"[yellow]{self.change_counts['changed']}[/yellow] changed, {self.change_counts['unchanged']} unchanged courses."
+                )
+        except Exception as e:
+            self.scraping_error = e
+        finally:
+            self.course_queue.put(None)  # Let the consumer know that scraping is over.
+
+    def iter_old_courses(self):
+        with open(COURSES_FILE_PATH, "r", encoding="utf-8") as file:
+            for line in file:
+                line = line.strip()
+                if line and "|" in line:
+                    yield line.split("|")[0].strip(), line
+
+    def iter_missing_courses(self):
         # Add missing courses from COURSES_FILE_PATH
         try:
             if path.exists(COURSES_FILE_PATH):
-                with open(COURSES_FILE_PATH, "r", encoding="utf-8") as file:
-                    for line in file:
-                        line = line.strip()
-                        if not line or "|" not in line:
-                            continue
-                        course_code = line.split("|")[0].strip()
-                        # Check if course_code is already in self.courses
-                        found = False
-                        for c in self.courses:
-                            if c.startswith(course_code + "|"):
-                                found = True
-                                break
-                        if not found:
-                            Logger.log_info(f"Adding missing course from old courses file: [i]\"{course_code}\"[/i]")
-                            self.courses.append(line)
+                for _, line in self.reconciler.iter_carried_over(self.iter_old_courses()):
+                    yield line
         except Exception as e:
             Logger.log_error(f"Error while adding missing courses from old courses file: {e}")
 
-        return self.courses
+        self.reconciler.log_stats()
+
+    def iter_courses(self, fetch_mode: str="threads", concurrency: int=MAX_CONCURRENT_REQUESTS):
+        """
+        Scrap all courses and yield the rows as soon as they are scraped, followed by the rows of the old courses
+        file that couldn't be scraped this time.
+        """
+        Logger.log_info("====== Scraping All Courses ======")
+
+        self.course_queue = queue.Queue(maxsize=COURSE_QUEUE_SIZE)
+        self.reconciler = Reconciler("course")
+        self.course_count = 0
+        self.scraping_error = None
+        scraping_thread = threading.Thread(target=self.scrap_courses_routine, args=(fetch_mode, concurrency))
+        scraping_thread.start()
+
+        row = ""
+        try:
+            while (row := self.course_queue.get()) is not None:
+                yield row
+        finally:
+            # If the consumer stopped early, keep draining the queue so the scraping threads don't block forever.
+            while row is not None:
+                row = self.course_queue.get()
+            scraping_thread.join()
+
+        # Otherwise the courses file would be written from the carried over rows only.
+        if self.scraping_error is not None:
+            raise RuntimeError("Scraping the courses failed.") from self.scraping_error
+
+        yield from self.iter_missing_courses()
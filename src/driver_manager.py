@@ -1,15 +1,78 @@
-from webdriver_manager.chrome import ChromeDriverManager
+from selenium.common.exceptions import SessionNotCreatedException
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium import webdriver
+from time import perf_counter
+from os import path
+import threading
 import atexit
+import json
+import queue
+import os
 from tqdm import tqdm
 from logger import Logger
+from constants import *
 
 
 class DriverManager:
     active_drivers = []
 
+    # Browsers are expensive to start, the pool creates up to pool_size of them on demand and hands them out again
+    # once they are released.
+    pool_size = 1
+    pooled_drivers = []
+    idle_drivers = queue.LifoQueue()
+    pool_lock = threading.Lock()
+
+    # Installing the WebDriver from multiple threads at the same time makes the downloads conflict, it's done once.
+    # The installed path is pinned in a manifest inside CHROMEDRIVER_CACHE_DIR, later runs use it without going online.
+    driver_path = None
+    driver_path_lock = threading.Lock()
+
+    @staticmethod
+    def get_manifest_path() -> str:
+        return path.join(CHROMEDRIVER_CACHE_DIR, "driver.json")
+
+    @staticmethod
+    def load_pinned_driver_path() -> str|None:
+        # CHROMEDRIVER_PATH lets a preinstalled driver be used as is.
+        env_driver_path = os.environ.get("CHROMEDRIVER_PATH")
+        if env_driver_path and path.exists(env_driver_path):
+            return env_driver_path
+
+        try:
+            with open(DriverManager.get_manifest_path(), "r", encoding="utf-8") as f:
+                driver_path = json.load(f)["path"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+        return driver_path if path.exists(driver_path) else None
+
+    @staticmethod
+    def install_driver() -> str:
+        # Imported here, webdriver_manager is slow to import and it's only needed when there is no pinned driver.
+        from webdriver_manager.chrome import ChromeDriverManager
+        from webdriver_manager.core.driver_cache import DriverCacheManager
+
+        Logger.log_info("Installing the Chrome WebDriver.")
+        cache_manager = DriverCacheManager(root_dir=CHROMEDRIVER_CACHE_DIR)
+        driver_path = ChromeDriverManager(driver_version=CHROMEDRIVER_VERSION, cache_manager=cache_manager).install()
+
+        os.makedirs(CHROMEDRIVER_CACHE_DIR, exist_ok=True)
+        with open(DriverManager.get_manifest_path(), "w", encoding="utf-8") as f:
+            json.dump({"path": driver_path}, f)
+
+        return driver_path
+
+    @staticmethod
+    def get_driver_path(reinstall: bool=False) -> str:
+        with DriverManager.driver_path_lock:
+            if reinstall:
+                DriverManager.driver_path = DriverManager.install_driver()
+            elif DriverManager.driver_path is None:
+                DriverManager.driver_path = DriverManager.load_pinned_driver_path() or DriverManager.install_driver()
+            return DriverManager.driver_path
+
     @staticmethod
     def create_driver():
         Logger.log_info("Creating a new web driver.")
@@ -23,7 +86,16 @@ class DriverManager:
         chrome_options.add_argument("--no-proxy-server")
         chrome_options.add_experimental_option('excludeSwitches', ['enable-logging'])
 
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
+        t0 = perf_counter()
+        try:
+            driver = webdriver.Chrome(service=Service(DriverManager.get_driver_path()), options=chrome_options)
+        except SessionNotCreatedException as e:
+            # The pinned driver doesn't match the installed Chrome anymore, install a matching one and try again.
+            Logger.log_warning(f"Pinned Chrome WebDriver couldn't start a session, reinstalling it: {e.msg}")
+            driver_path = DriverManager.get_driver_path(reinstall=True)
+            driver = webdriver.Chrome(service=Service(driver_path), options=chrome_options)
+
+        Logger.log_info(f"Created the web driver in [green]{round(perf_counter() - t0, 2)}[/green] seconds.")
         DriverManager.active_drivers.append(driver)
         return driver
 
@@ -33,6 +105,51 @@ class DriverManager:
         if driver in DriverManager.active_drivers:
             DriverManager.active_drivers.remove(driver)
 
+    @staticmethod
+    def set_pool_size(pool_size: int) -> None:
+        DriverManager.pool_size = max(1, pool_size)
+
+    @staticmethod
+    def acquire_driver():
+        # Reuse an idle driver if there is one, create a new one if the pool isn't full, otherwise wait for one.
+        try:
+            return DriverManager.idle_drivers.get_nowait()
+        except queue.Empty:
+            pass
+
+        with DriverManager.pool_lock:
+            if len(DriverManager.pooled_drivers) < DriverManager.pool_size:
+                driver = DriverManager.create_driver()
+                DriverManager.pooled_drivers.append(driver)
+                return driver
+
+        return DriverManager.idle_drivers.get()
+
+    @staticmethod
+    def release_driver(driver) -> None:
+        DriverManager.idle_drivers.put(driver)
+
+    @staticmethod
+    def discard_driver(driver) -> None:
+        # Closes a broken driver of the pool, a new one is created in its place the next time one is needed.
+        with DriverManager.pool_lock:
+            if driver in DriverManager.pooled_drivers:
+                DriverManager.pooled_drivers.remove(driver)
+
+        try:
+            DriverManager.kill_driver(driver)
+        except Exception as e:
+            Logger.log_warning(f"Couldn't quit the web driver: {e}")
+
+    @staticmethod
+    def close_pool() -> None:
+        with DriverManager.pool_lock:
+            for driver in DriverManager.pooled_drivers:
+                DriverManager.kill_driver(driver)
+
+            DriverManager.pooled_drivers = []
+            DriverManager.idle_drivers = queue.LifoQueue()
+
     @staticmethod
     def clear_drivers():
         if len(DriverManager.active_drivers) == 0:
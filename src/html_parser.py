@@ -0,0 +1,11 @@
+from bs4 import BeautifulSoup
+
+from metrics import Metrics
+
+
+class HtmlParser:
+    # Every page goes through here so the time spent parsing shows up as the "parse" stage of the metrics report.
+    @staticmethod
+    def make_soup(markup) -> BeautifulSoup:
+        with Metrics.stage("parse"):
+            return BeautifulSoup(markup, "html.parser")
@@ -0,0 +1,151 @@
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from hashlib import sha1, sha256
+import threading
+import requests
+import re
+import json
+import os
+
+from metrics import Metrics
+from logger import Logger
+from constants import *
+
+
+class HttpCache:
+    """
+    On-disk cache for GET requests, shared by all the scrapers.
+
+    Response bodies are stored together with their validators (ETag, Last-Modified) and content hash. Validators are
+    sent back as If-None-Match/If-Modified-Since, a 304 response or a 200 response with an unchanged body is a hit.
+    Returned responses have `cache_hit` and `not_modified` (a 304, the body wasn't downloaded) attributes set.
+    """
+
+    # Parts of a page that change on every request, they are left out of the content hash. The course pages have a
+    # per-request anti-forgery token for example, with it they would never be a hit.
+    VOLATILE_CONTENT_PATTERN = re.compile(rb'<input[^>]*name="__RequestVerificationToken"[^>]*>')
+
+    enabled = True
+    cache_dir = HTTP_CACHE_DIR
+    stats = {"hit": 0, "miss": 0}
+    stats_lock = threading.Lock()
+
+    @staticmethod
+    def strip_volatile_content(body: bytes) -> bytes:
+        return HttpCache.VOLATILE_CONTENT_PATTERN.sub(b"", body)
+
+    @staticmethod
+    def get_content_hash(body: bytes) -> str:
+        return sha256(HttpCache.strip_volatile_content(body)).hexdigest()
+
+    @staticmethod
+    def get_entry_path(url: str) -> str:
+        key = sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(HttpCache.cache_dir, key[:2], key)
+
+    @staticmethod
+    def load_entry(url: str) -> tuple[dict, bytes]|None:
+        entry_path = HttpCache.get_entry_path(url)
+        try:
+            with open(entry_path + ".json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(entry_path + ".body", "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+
+        # Two URLs with the same hash prefix is practically impossible but just in case.
+        if meta.get("url") != url or HttpCache.get_content_hash(body) != meta.get("content_hash"):
+            return None
+
+        return meta, body
+
+    @staticmethod
+    def write_atomic(file_path: str, data: bytes) -> None:
+        tmp_path = f"{file_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, file_path)
+
+    @staticmethod
+    def save_entry(url: str, resp: requests.Response, content_hash: str) -> None:
+        entry_path = HttpCache.get_entry_path(url)
+        meta = {
+            "url": url,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "content_type": resp.headers.get("Content-Type"),
+            "content_hash": content_hash,
+        }
+
+        try:
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            HttpCache.write_atomic(entry_path + ".body", resp.content)
+            HttpCache.write_atomic(entry_path + ".json", json.dumps(meta).encode("utf-8"))
+        except OSError as e:
+            Logger.log_warning(f"Could not write the HTTP cache entry of {url}, error: {e}")
+
+    @staticmethod
+    def build_cached_response(url: str, meta: dict, body: bytes, resp: requests.Response) -> requests.Response:
+        # Turn the 304 into the 200 response we would have gotten, so the callers don't need to care.
+        resp.status_code = 200
+        resp._content = body
+        resp.url = url
+        resp.headers = CaseInsensitiveDict(resp.headers)
+        if meta.get("content_type"):
+            resp.headers["Content-Type"] = meta["content_type"]
+        resp.encoding = get_encoding_from_headers(resp.headers)
+
+        return resp
+
+    @staticmethod
+    def record(is_hit: bool) -> None:
+        with HttpCache.stats_lock:
+            HttpCache.stats["hit" if is_hit else "miss"] += 1
+        Metrics.increment("http_cache_hits" if is_hit else "http_cache_misses")
+
+    @staticmethod
+    def get(url: str, session=None, **kwargs) -> requests.Response:
+        session = requests if session is None else session
+        if not HttpCache.enabled:
+            resp = session.get(url, **kwargs)
+            resp.cache_hit = resp.not_modified = False
+            return resp
+
+        entry = HttpCache.load_entry(url)
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry is not None:
+            meta, _ = entry
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        resp = session.get(url, headers=headers, **kwargs)
+
+        if resp.status_code == 304 and entry is not None:
+            resp = HttpCache.build_cached_response(url, *entry, resp)
+            resp.cache_hit = resp.not_modified = True
+        elif resp.status_code == 200:
+            content_hash = HttpCache.get_content_hash(resp.content)
+            resp.cache_hit = entry is not None and entry[0].get("content_hash") == content_hash
+            resp.not_modified = False
+
+            # Validators might change even when the content doesn't, keep them up to date.
+            if not resp.cache_hit or entry[0].get("etag") != resp.headers.get("ETag") \
+                    or entry[0].get("last_modified") != resp.headers.get("Last-Modified"):
+                HttpCache.save_entry(url, resp, content_hash)
+        else:
+            resp.cache_hit = resp.not_modified = False
+            return resp
+
+        HttpCache.record(resp.cache_hit)
+        return resp
+
+    @staticmethod
+    def log_stats() -> None:
+        total = HttpCache.stats["hit"] + HttpCache.stats["miss"]
+        if total == 0:
+            return
+
+        Logger.log_info(f"HTTP cache: [green]{HttpCache.stats['hit']}[/green] hits, {HttpCache.stats['miss']} misses out of {total} requests.")
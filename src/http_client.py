@@ -0,0 +1,264 @@
+from time import perf_counter, monotonic
+from urllib.parse import urlsplit
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import threading
+import requests
+
+from http_cache import HttpCache
+from recorder import Recorder
+from metrics import Metrics
+from logger import Logger
+from constants import *
+
+
+class ConnectionStats:
+    lock = threading.Lock()
+    hosts = {}  # host -> {"opened": int, "requests": int}
+
+    @staticmethod
+    def increment(host: str, key: str) -> None:
+        with ConnectionStats.lock:
+            if host not in ConnectionStats.hosts:
+                ConnectionStats.hosts[host] = {"opened": 0, "requests": 0}
+            ConnectionStats.hosts[host][key] += 1
+
+
+class CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        ConnectionStats.increment(self.host, "opened")
+        return super()._new_conn()
+
+    def _make_request(self, *args, **kwargs):
+        ConnectionStats.increment(self.host, "requests")
+        return super()._make_request(*args, **kwargs)
+
+
+class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        ConnectionStats.increment(self.host, "opened")
+        return super()._new_conn()
+
+    def _make_request(self, *args, **kwargs):
+        ConnectionStats.increment(self.host, "requests")
+        return super()._make_request(*args, **kwargs)
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": CountingHTTPConnectionPool,
+            "https": CountingHTTPSConnectionPool,
+        }
+
+
+class CountingRetry(Retry):
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        Metrics.increment("http_retries")
+
+        # Retries are only made on errors and 429/5xx responses, the host is struggling either way.
+        if _pool is not None and ConcurrencyLimiter.enabled:
+            ConcurrencyLimiter.get_limit(_pool.host).back_off()
+
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+
+class HostConcurrencyLimit:
+    """
+    AIMD limit of the requests in flight to a host. Every healthy response grows the limit by 1 / limit, so it grows by
+    about 1 per round of requests, and 429/5xx responses or timeouts multiply it by the decrease factor. Requests that
+    were in flight together fail together, so the limit is only cut once per average latency.
+    """
+
+    def __init__(self, host: str, initial: int, minimum: int, maximum: int) -> None:
+        self.host = host
+        self.limit = float(initial)
+        self.minimum, self.maximum = minimum, maximum
+        self.in_flight = 0
+        self.condition = threading.Condition()
+        self.latency_average = None
+        self.last_decrease = 0.0
+        self.stats = {"increases": 0, "decreases": 0, "waits": 0, "peak": initial}
+
+    def acquire(self) -> None:
+        with self.condition:
+            if self.in_flight >= int(self.limit):
+                self.stats["waits"] += 1
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency: float, overloaded: bool) -> None:
+        with self.condition:
+            self.in_flight -= 1
+            if overloaded:
+                self.decrease()
+            else:
+                # Slow responses don't cut the limit, but they don't grow it either.
+                if self.latency_average is None or latency <= self.latency_average * HTTP_CONCURRENCY_LATENCY_TOLERANCE:
+                    self.increase()
+                self.latency_average = latency if self.latency_average is None else .9 * self.latency_average + .1 * latency
+
+            self.condition.notify_all()
+
+    def back_off(self) -> None:
+        with self.condition:
+            self.decrease()
+
+    def increase(self) -> None:
+        previous_limit = int(self.limit)
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        if int(self.limit) > previous_limit:
+            self.stats["increases"] += 1
+            self.stats["peak"] = max(self.stats["peak"], int(self.limit))
+
+    def decrease(self) -> None:
+        now = monotonic()
+        if now - self.last_decrease < (self.latency_average or 1) or self.limit <= self.minimum:
+            return
+
+        self.limit = max(self.minimum, self.limit * HTTP_CONCURRENCY_DECREASE_FACTOR)
+        self.last_decrease = now
+        self.stats["decreases"] += 1
+        Metrics.increment("concurrency_decreases")
+        Logger.log_warning(f"[blue]{self.host}[/blue] is struggling, cutting its concurrency limit to {int(self.limit)}.")
+
+
+class ConcurrencyLimiter:
+    # host -> HostConcurrencyLimit, shared by every scraper so they all back off together.
+    enabled = True
+    initial = HTTP_CONCURRENCY_INITIAL
+    minimum = HTTP_CONCURRENCY_MIN
+    maximum = MAX_CONCURRENT_REQUESTS
+    lock = threading.Lock()
+    hosts = {}
+
+    @staticmethod
+    def configure(enabled: bool=True, maximum: int=None) -> None:
+        ConcurrencyLimiter.enabled = enabled
+        if maximum is not None:
+            ConcurrencyLimiter.maximum = max(ConcurrencyLimiter.minimum, maximum)
+            ConcurrencyLimiter.initial = min(HTTP_CONCURRENCY_INITIAL, ConcurrencyLimiter.maximum)
+
+    @staticmethod
+    def get_limit(host: str) -> HostConcurrencyLimit:
+        with ConcurrencyLimiter.lock:
+            if host not in ConcurrencyLimiter.hosts:
+                ConcurrencyLimiter.hosts[host] = HostConcurrencyLimit(
+                    host, ConcurrencyLimiter.initial, ConcurrencyLimiter.minimum, ConcurrencyLimiter.maximum
+                )
+            return ConcurrencyLimiter.hosts[host]
+
+    @staticmethod
+    def get_worker_count() -> int:
+        # With the limiter on, there should be enough workers to reach the maximum, the limiter holds them back.
+        return ConcurrencyLimiter.maximum if ConcurrencyLimiter.enabled else MAX_THREAD_COUNT
+
+    @staticmethod
+    def log_stats() -> None:
+        for host, limit in sorted(ConcurrencyLimiter.hosts.items()):
+            stats = limit.stats
+            Logger.log_info(
+                f"Concurrency limit of [blue]{host}[/blue]: ended at {int(limit.limit)}, peaked at {stats['peak']}, "
+                f"grew {stats['increases']} and was cut [red]{stats['decreases']}[/red] times, requests waited for it {stats['waits']} times."
+            )
+
+
+class HttpClient:
+    """
+    Process-wide HTTP client, every scraper should send its requests through here.
+
+    Connections are kept alive and pooled per host (up to pool_maxsize connections each) and the same retry/backoff
+    policy applies to every request. Requests go through the HttpCache unless use_cache is False. The requests in
+    flight to each host are limited by the ConcurrencyLimiter.
+    """
+
+    session = None
+    session_lock = threading.Lock()
+    pool_maxsize = HTTP_POOL_MAXSIZE
+    retry_count = HTTP_RETRY_COUNT
+    backoff_factor = HTTP_BACKOFF_FACTOR
+
+    @staticmethod
+    def configure(pool_maxsize: int=None, retry_count: int=None, backoff_factor: float=None) -> None:
+        with HttpClient.session_lock:
+            if pool_maxsize is not None:
+                HttpClient.pool_maxsize = pool_maxsize
+            if retry_count is not None:
+                HttpClient.retry_count = retry_count
+            if backoff_factor is not None:
+                HttpClient.backoff_factor = backoff_factor
+
+            # The session is created again with the new settings on the next request.
+            if HttpClient.session is not None:
+                HttpClient.session.close()
+                HttpClient.session = None
+
+    @staticmethod
+    def create_session() -> requests.Session:
+        retry_strategy = CountingRetry(
+            total=HttpClient.retry_count,
+            status_forcelist=[429, 500, 502, 503, 504],
+            method_whitelist=["HEAD", "GET", "OPTIONS"],
+            backoff_factor=HttpClient.backoff_factor,
+        )
+        adapter = CountingHTTPAdapter(max_retries=retry_strategy, pool_maxsize=HttpClient.pool_maxsize)
+
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    @staticmethod
+    def get_session() -> requests.Session:
+        with HttpClient.session_lock:
+            if HttpClient.session is None:
+                HttpClient.session = HttpClient.create_session()
+            return HttpClient.session
+
+    @staticmethod
+    def get(url: str, use_cache: bool=True, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", HTTP_TIMEOUT)
+        session = HttpClient.get_session()
+
+        # While replaying a recording, the requests go to the local replay server. Caching it makes no sense.
+        request_url = url
+        if Recorder.mode == "replay":
+            request_url, use_cache = Recorder.get_replay_url(url), False
+
+        host_limit = ConcurrencyLimiter.get_limit(urlsplit(request_url).hostname) if ConcurrencyLimiter.enabled else None
+        if host_limit is not None:
+            host_limit.acquire()
+
+        t0 = perf_counter()
+        try:
+            with Metrics.stage("fetch"):
+                resp = HttpCache.get(request_url, session, **kwargs) if use_cache else session.get(request_url, **kwargs)
+        except Exception as e:
+            Metrics.record_request(url, perf_counter() - t0, is_error=True)
+            if host_limit is not None:
+                host_limit.release(perf_counter() - t0, overloaded=isinstance(e, requests.RequestException))
+            raise
+
+        if host_limit is not None:
+            host_limit.release(perf_counter() - t0, overloaded=resp.status_code == 429 or resp.status_code >= 500)
+
+        if Recorder.mode == "record":
+            Recorder.record_response(url, resp)
+
+        # Only the bodies of 304 responses weren't downloaded, unchanged 200 ones count as hits but were still transferred.
+        byte_count = 0 if getattr(resp, "not_modified", False) else len(resp.content)
+        Metrics.record_request(url, perf_counter() - t0, byte_count, is_error=resp.status_code >= 400)
+        return resp
+
+    @staticmethod
+    def log_stats() -> None:
+        ConcurrencyLimiter.log_stats()
+        for host, stats in sorted(ConnectionStats.hosts.items()):
+            reused = max(0, stats["requests"] - stats["opened"])
+            Logger.log_info(
+                f"HTTP connections to [blue]{host}[/blue]: {stats['requests']} requests, "
+                f"{stats['opened']} connections opened, [green]{reused}[/green] reused."
+            )
@@ -0,0 +1,72 @@
+from datetime import datetime, timezone
+from os import path
+import json
+
+from records import Lesson
+from metrics import Metrics
+from logger import Logger
+from constants import *
+
+
+class LessonChangelog:
+    """
+    Keeps an append-only changelog of lessons.psv, so consumers don't need to diff the whole file every 5 minutes.
+
+    Each run that changes anything appends a single JSON line:
+    {"time": ..., "added": {crn: row}, "removed": [crn, ...], "changed": {crn: {field: [old, new]}}}
+    """
+
+    @staticmethod
+    def load_lesson_index(file_path: str=LESSONS_FILE_PATH) -> dict[str, str]|None:
+        # CRN -> row, None if there is no file yet.
+        if not path.exists(file_path):
+            return None
+
+        lesson_index = {}
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if "|" in line:
+                    lesson_index[line.split("|", 1)[0]] = line
+
+        return lesson_index
+
+    @staticmethod
+    def get_changed_fields(old_row: str, new_row: str) -> dict[str, list[str]]:
+        old_cells, new_cells = old_row.split("|"), new_row.split("|")
+        field_count = max(len(old_cells), len(new_cells))
+        old_cells += [""] * (field_count - len(old_cells))
+        new_cells += [""] * (field_count - len(new_cells))
+
+        changed_fields = {}
+        for i, (old_cell, new_cell) in enumerate(zip(old_cells, new_cells)):
+            if old_cell != new_cell:
+                field = Lesson.FIELDS[i] if i < len(Lesson.FIELDS) else str(i)
+                changed_fields[field] = [old_cell, new_cell]
+
+        return changed_fields
+
+    @staticmethod
+    def compute_delta(previous: dict[str, str], current: dict[str, str]) -> dict:
+        with Metrics.stage("merge"):
+            added = {crn: row for crn, row in current.items() if crn not in previous}
+            removed = [crn for crn in previous if crn not in current]
+            changed = {
+                crn: LessonChangelog.get_changed_fields(previous[crn], row)
+                for crn, row in current.items() if crn in previous and previous[crn] != row
+            }
+
+        return {"added": added, "removed": removed, "changed": changed}
+
+    @staticmethod
+    def append(delta: dict, file_path: str=LESSONS_CHANGELOG_FILE_PATH) -> None:
+        Logger.log_info(
+            f"Lesson changes: [green]{len(delta['added'])}[/green] added, [red]{len(delta['removed'])}[/red] removed, "
+            f"[yellow]{len(delta['changed'])}[/yellow] changed."
+        )
+
+        # Create the file even if nothing changed, so it can always be pushed.
+        with open(file_path, "a", encoding="utf-8") as f:
+            if delta["added"] or delta["removed"] or delta["changed"]:
+                entry = {"time": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"), **delta}
+                f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
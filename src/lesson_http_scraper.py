@@ -0,0 +1,76 @@
+from bs4.dammit import EntitySubstitution
+from bs4.formatter import HTMLFormatter
+from tqdm import tqdm
+
+from http_client import HttpClient
+from logger import Logger
+from html_parser import HtmlParser
+from constants import *
+
+
+class LessonHttpScraper:
+    # Serializes the rows the same way Chrome's outerHTML does (<br> instead of <br/>, &nbsp; kept as an entity and
+    # non-ASCII characters left as is), so the rows can be fed to save_lesson_rows just like the Selenium ones.
+    OUTER_HTML_FORMATTER = HTMLFormatter(
+        entity_substitution=lambda s: EntitySubstitution.substitute_xml(s).replace("\xa0", "&nbsp;"),
+        void_element_close_prefix=None,
+    )
+
+    def __init__(self, programme_level: str="LS") -> None:
+        self.programme_level = programme_level
+
+    def get_branch_codes(self) -> list[tuple[str, str]]:
+        # This is the endpoint the dropdown on LESSONS_URL is filled from, returns a list of
+        # {"bransKoduId": 3, "dersBransKodu": "BLG", ...} objects.
+        # Lessons change all the time, there is no point in caching them.
+        resp = HttpClient.get(LESSONS_BRANCH_CODES_API_URL.format(self.programme_level), use_cache=False, timeout=25)
+        resp.raise_for_status()
+
+        return [(str(b["bransKoduId"]), b["dersBransKodu"].strip()) for b in resp.json()]
+
+    def scrap_table(self, branch_code_id: str) -> list[str]:
+        resp = HttpClient.get(LESSONS_API_URL.format(self.programme_level, branch_code_id), use_cache=False, timeout=25)
+        resp.raise_for_status()
+        return LessonHttpScraper.get_table_rows(resp.text)
+
+    @staticmethod
+    def get_table_rows(html: str) -> list[str]:
+        soup = HtmlParser.make_soup(html)
+        return [
+            row.decode(formatter=LessonHttpScraper.OUTER_HTML_FORMATTER) for row in soup.find_all("tr")
+            if " ".join(row.get("class", [])) != "table-baslik"  # Filter out the header rows.
+        ]
+
+    def scrap_tables(self) -> list[str]:
+        return list(self.iter_tables())
+
+    def iter_tables(self, schedule=None):
+        branch_codes = self.get_branch_codes()
+        if schedule is not None:
+            branch_codes = schedule.order(branch_codes, lambda b: b[1])
+        lesson_count, branch_codes_tqdm = 0, tqdm(branch_codes)
+        failed_branch_codes = []
+
+        for branch_code_id, branch_code in branch_codes_tqdm:
+            if schedule is not None and not schedule.has_time_for(branch_code):
+                Logger.log_info("Lesson time budget is used up, the remaining branch codes are carried over.")
+                break
+
+            branch_codes_tqdm.set_description(f"Scraping \"{branch_code}\" lessons - current total: {lesson_count:04}")
+
+            try:
+                rows = self.scrap_table(branch_code_id)
+            except Exception as e:
+                Logger.log_error("Failed to scrap the lessons of \"%s\", error: %s", branch_code, e)
+                # The schedule carries the old rows of the branch code over, without it they would be lost.
+                if schedule is None:
+                    failed_branch_codes.append(branch_code)
+                continue
+
+            if schedule is not None:
+                schedule.mark_scraped(branch_code)
+            lesson_count += len(rows)
+            yield from rows
+
+        if failed_branch_codes:
+            raise RuntimeError(f"Failed to scrap the lessons of {len(failed_branch_codes)} branch codes: {failed_branch_codes}")
@@ -0,0 +1,57 @@
+import re
+
+from records import Lesson
+
+
+class LessonNormalizer:
+    """
+    Turns the raw <tr> rows of the lesson table into Lesson records, Lesson.to_psv gives the lessons.psv line.
+    """
+
+    PIPE_SPACES_PATTERN = re.compile(r"\s*\|\s*")
+
+    # (index after splitting the row by "<td>", is the value inside an <a> tag)
+    COLUMNS = (
+        (1, False),  # CRN
+        (2, True),  # Course Code
+        (4, False),  # Teaching Method
+        (5, False),  # Instructor
+        (6, True),  # Building
+        (7, False),  # Day
+        (8, False),  # Time
+        (9, False),  # Room
+        (10, False),  # Capacity
+        (11, False),  # Enrolled
+        (13, True),  # Major Rest.
+    )
+
+    @staticmethod
+    def extract_from_a(a: str) -> str:
+        if ">" not in a:
+            return a
+        return a.split(">")[1].split("<")[0].strip()
+
+    @staticmethod
+    def normalize_lesson_row(row: str) -> Lesson:
+        # Chained str.replace calls run in C and beat a regex tokenizer here, so the markup is still removed this way.
+        cells = row.replace("<tr>", "").replace("</tr>", "").replace("</td>", "") \
+            .replace("<br>", " ").replace("</br>", "").split("<td>")
+
+        extract_from_a = LessonNormalizer.extract_from_a
+        fields = [extract_from_a(cells[i]) if is_anchor else cells[i] for i, is_anchor in LessonNormalizer.COLUMNS]
+        line = "|".join(fields).replace("\n", "").replace("\t", "")
+
+        # Stripping each field is the same as removing the spaces around the separators, unless a field has a "|" in
+        # it. Those rare rows are cleaned one field at a time with the regex instead.
+        parts = line.split("|")
+        if len(parts) == len(LessonNormalizer.COLUMNS):
+            return Lesson(*[part.strip() for part in parts])
+
+        return Lesson(*[
+            LessonNormalizer.PIPE_SPACES_PATTERN.sub("|", field.replace("\n", "").replace("\t", "")).strip() for field in fields
+        ])
+
+    @staticmethod
+    def normalize_lesson_rows(rows: list[str]) -> list[Lesson]:
+        normalize_lesson_row = LessonNormalizer.normalize_lesson_row
+        return [normalize_lesson_row(row) for row in rows]
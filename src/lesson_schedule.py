@@ -0,0 +1,145 @@
+from datetime import datetime, timezone
+from time import perf_counter
+from os import path
+import json
+import os
+
+from logger import Logger
+from constants import *
+
+
+class LessonSchedule:
+    """
+    Decides which branch codes are scraped in a lesson run and in which order.
+
+    Branch codes are ranked by how many of the last entries of the lessons changelog changed the capacity or enrolled
+    count of one of their lessons. The hottest ones are scraped on every run, the rest (cold) are scraped after them,
+    least recently scraped first, until the time budget runs out. The lessons of the branch codes that are not scraped
+    are carried over from the previous lessons.psv, so the cold ones are rotated across runs.
+    """
+
+    CHANGE_FIELDS = ("capacity", "enrolled")
+
+    def __init__(self, previous_lessons: dict[str, str]|None, time_budget: float=LESSON_TIME_BUDGET,
+                 hot_limit: int=LESSON_HOT_BRANCH_LIMIT, file_path: str=LESSON_SCHEDULE_FILE_PATH) -> None:
+        self.previous_lessons = previous_lessons or {}
+        self.time_budget = time_budget
+        self.hot_limit = hot_limit
+        self.file_path = file_path
+        self.t0 = perf_counter()
+
+        self.last_scraped = self.load_last_scraped()
+        self.heat = self.compute_heat()
+        self.branch_codes = None  # Branch codes that exist this run, set by order.
+        self.hot_branch_codes = set()
+        self.scraped_branch_codes = set()
+
+    @staticmethod
+    def get_branch_code(row: str) -> str:
+        # "12345|BLG 101E|..." -> "BLG"
+        cells = row.split("|", 2)
+        return cells[1].split(" ")[0].strip() if len(cells) > 1 else ""
+
+    @staticmethod
+    def read_last_lines(file_path: str, line_count: int, block_size: int=1 << 16) -> list[str]:
+        # The changelog only grows, read it backwards so the cost doesn't grow with it.
+        with open(file_path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            position, data = f.tell(), b""
+            while position > 0 and data.count(b"\n") <= line_count:
+                read_size = min(block_size, position)
+                position -= read_size
+                f.seek(position)
+                data = f.read(read_size) + data
+
+        lines = data.decode("utf-8", errors="ignore").splitlines()
+        # The first line may be cut in half unless the whole file was read.
+        if position > 0:
+            lines = lines[1:]
+        return lines[-line_count:]
+
+    def compute_heat(self) -> dict[str, int]:
+        heat = {}
+        if not path.exists(LESSONS_CHANGELOG_FILE_PATH):
+            return heat
+
+        for line in self.read_last_lines(LESSONS_CHANGELOG_FILE_PATH, LESSON_SCHEDULE_HISTORY):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+
+            # Each branch code is counted once per changelog entry.
+            changed_branch_codes = set()
+            for crn, fields in entry.get("changed", {}).items():
+                if crn in self.previous_lessons and any(field in fields for field in self.CHANGE_FIELDS):
+                    changed_branch_codes.add(self.get_branch_code(self.previous_lessons[crn]))
+
+            for branch_code in changed_branch_codes:
+                heat[branch_code] = heat.get(branch_code, 0) + 1
+
+        return heat
+
+    def load_last_scraped(self) -> dict[str, str]:
+        if not path.exists(self.file_path):
+            return {}
+
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as f:
+                return json.load(f)["last_scraped"]
+        except (ValueError, KeyError) as e:
+            Logger.log_warning(f"Lesson schedule is corrupted, starting from scratch: {e}")
+            return {}
+
+    def save(self) -> None:
+        tmp_path = f"{self.file_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"last_scraped": self.last_scraped}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.file_path)
+
+    def order(self, items: list, get_branch_code=lambda item: item) -> list:
+        self.branch_codes = {get_branch_code(item) for item in items}
+        hot_items = sorted(
+            [item for item in items if self.heat.get(get_branch_code(item), 0) > 0],
+            key=lambda item: -self.heat[get_branch_code(item)],
+        )[:self.hot_limit]
+        self.hot_branch_codes = {get_branch_code(item) for item in hot_items}
+
+        # Never scraped ones first, then the least recently scraped ones. Timestamps are ISO strings, they sort fine.
+        cold_items = sorted(
+            [item for item in items if get_branch_code(item) not in self.hot_branch_codes],
+            key=lambda item: self.last_scraped.get(get_branch_code(item), ""),
+        )
+
+        Logger.log_info(
+            f"Lesson schedule: [red]{len(hot_items)}[/red] hot and [blue]{len(cold_items)}[/blue] cold branch codes, "
+            f"time budget is {self.time_budget} seconds."
+        )
+        return hot_items + cold_items
+
+    def has_time_for(self, branch_code: str) -> bool:
+        return branch_code in self.hot_branch_codes or perf_counter() - self.t0 < self.time_budget
+
+    def mark_scraped(self, branch_code: str) -> None:
+        self.scraped_branch_codes.add(branch_code)
+        self.last_scraped[branch_code] = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    def iter_carried_over_rows(self):
+        # Rows of the previous lessons.psv whose branch code wasn't scraped this run, they are already normalized.
+        # Branch codes that are not listed anymore are dropped, their lessons would be carried over forever otherwise.
+        carried_over_count, removed_count = 0, 0
+        for row in self.previous_lessons.values():
+            branch_code = self.get_branch_code(row)
+            if branch_code in self.scraped_branch_codes:
+                continue
+
+            if self.branch_codes is not None and branch_code not in self.branch_codes:
+                removed_count += 1
+                continue
+
+            carried_over_count += 1
+            yield row
+
+        Logger.log_info(f"Carried over {carried_over_count} lessons of the branch codes that weren't scraped this run.")
+        if removed_count:
+            Logger.log_info(f"Dropped {removed_count} lessons of the branch codes that are not listed anymore.")
@@ -1,28 +1,43 @@
 from selenium.webdriver.common.by import By
 from tqdm import tqdm
+import threading
+import queue
 
 from selenium.common.exceptions import UnexpectedAlertPresentException
 from selenium.common.exceptions import StaleElementReferenceException
 
+from driver_manager import DriverManager
+from recorder import Recorder
+from metrics import Metrics
 from scraper import Scraper
 from logger import Logger
 from constants import *
 
 
 class LessonScraper(Scraper):
+    # Returns the index of the placeholder option once the course codes are loaded after it, null until then.
+    DROPDOWN_READY_SCRIPT = """
+        const options = Array.from(document.querySelectorAll("option"));
+        const index = options.findIndex(o => o.innerHTML.includes("Ders Kodu Seçiniz"));
+        return index >= 0 && index < options.length - 1 ? index : null;
+    """
+
     def __init__(self, webdriver):
         super().__init__(webdriver)
         self.load_page(LESSONS_URL)
+        self.dropdown_options = []
+        self.option_indices = {}  # branch code -> index in dropdown_options
+        self.submit_button = None
 
     def scrap_current_table(self) -> list[str]:
         try:
             rows = self.find_elements_by_tag("tr")
-    
+
             return [
                 row.get_attribute("outerHTML") for row in rows
                 if row.get_attribute("class") != "table-baslik"  # Filter out the header rows.
             ]
-        
+
         # If a course has no lessons, an alert dialogue will be displayed. If that happens, return an empty row.
         except UnexpectedAlertPresentException:
             self.dismiss_alert()
@@ -38,68 +53,230 @@ class LessonScraper(Scraper):
         for option in self.find_elements_by_tag("option"):
             if option.get_attribute("value") == "LS":
                 option.click()
-                self.wait()
                 break
 
-    def scrap_tables(self) -> list[str]:
-        def update_dropdown_references():
-            self.generate_dropdown_options()
-            dropdown_options = self.webdriver.find_elements(By.TAG_NAME, "option")
-
-            # The options we want are course codes, they start after the initial value of
-            # the dropdown which is "Ders Kodu Seçiniz"
-            start_index = 0
-            for _ in range(20):
-                for i, o in enumerate(dropdown_options):
-                    if "Ders Kodu Seçiniz" in o.get_attribute("innerHTML"):
-                        start_index = i + 1
-                        break
-                else:
-                    Logger.log_warning("Course Dropdown is not loaded yet, waiting.")
-                    self.wait(5)
-                    dropdown_options = self.webdriver.find_elements(By.TAG_NAME, "option")
-                    continue
-                break
+    def update_dropdown_references(self) -> list[str]:
+        # Finds the course code options and the submit button again, returns the branch codes in dropdown order.
+        self.generate_dropdown_options()
+
+        # The options we want are course codes, they start after the initial value of
+        # the dropdown which is "Ders Kodu Seçiniz". Wait until there are options after it.
+        placeholder_index = self.wait_for("dropdown_options", lambda driver: driver.execute_script(self.DROPDOWN_READY_SCRIPT))
+        if placeholder_index is None:
+            Logger.log_warning("Course Dropdown didn't load in time, using the options that are there.")
+        start_index = 0 if placeholder_index is None else placeholder_index + 1
+        dropdown_options = self.webdriver.find_elements(By.TAG_NAME, "option")
+
+        self.submit_button = self.find_elements_by_tag("button")[0]
+        self.dropdown_options = dropdown_options[start_index:]
+
+        branch_codes = [o.get_attribute("innerHTML").strip() for o in self.dropdown_options]
+        self.option_indices = {branch_code: i for i, branch_code in enumerate(branch_codes)}
+        return branch_codes
+
+    def scrap_branch_code_table(self, branch_code: str) -> list[str]|None:
+        # Returns None if the table couldn't be scraped, so the caller can tell it apart from a branch with no lessons.
+        for _ in range(20):
+            rows = []
+            try:
+                dropdown_option = self.dropdown_options[self.option_indices[branch_code]]
+
+                self.wait_until_loaded(dropdown_option)  # Wait for the dropdown option to load.
+                dropdown_option.click()  # Choose the current course from the dropdown.
+
+                table_version = self.get_table_version()
+                self.submit_button.click()  # Click Submit.
+
+                # Either the new rows are rendered or the "Kayıt bulunamadı." alert shows up, skip the course if it's the latter.
+                outcome = self.wait_for_table_or_alert(table_version)
+                if outcome == "alert":
+                    self.dismiss_alert()
+                    return []
+
+                rows = self.scrap_current_table()
 
-            submit_button = self.find_elements_by_tag("button")[0]
-            return dropdown_options[start_index:], submit_button
-
-        dropdown_options, submit_button = update_dropdown_references()
-        lessons, option_parent_tqdm = [], tqdm(range(0, len(dropdown_options)))
-
-        for i in option_parent_tqdm:
-            for _ in range(20):
-                rows = []
-                try:
-                    # Check if the dropdown option is valid.
-                    dropdown_option = dropdown_options[i]
-                    if dropdown_option is None: return []
-        
-                    # Update the tqdm.
-                    course_name = dropdown_option.get_attribute("innerHTML").strip()
-                    option_parent_tqdm.set_description(f"Scraping \"{course_name}\" lessons - current total: {len(lessons):04}")
-        
-                    self.wait_until_loaded(dropdown_option)  # Wait for the dropdown option to load.
-                    dropdown_option.click()  # Choose the current course from the dropdown.
-        
-                    submit_button.click()  # Click Submit.
-        
-                    # Wait for the "Kayıt bulunamadı." alert, if it occurs, skip this course.
-                    alert_dismissed = self.wait_for_and_dismiss_alert(20)
-                    if alert_dismissed:
-                        break
-        
-                    # Scrap the lessons. Because the script is fast, sometimes the lessons don't load,
-                    # take that into account and wait a bit if lesson count is 0.
+                # If neither was seen in time, fall back to polling the table for a bit.
+                if outcome is None:
                     for _ in range(20):
-                        rows = self.scrap_current_table()
                         if len(rows) != 0:
                             break
                         self.wait()
-                except UnexpectedAlertPresentException:
-                    break
-                
-                lessons += rows
+                        rows = self.scrap_current_table()
+
+                # The table is rendered by the page's scripts, keep what it looked like for each branch code.
+                if Recorder.mode == "record":
+                    Recorder.record_page_source(f"{LESSONS_URL}#{branch_code}", self.webdriver.page_source)
+            except UnexpectedAlertPresentException:
+                return []
+            except StaleElementReferenceException:
+                # The dropdown was rendered again, our references point to the old elements. Find them again and retry.
+                Logger.log_warning("Dropdown went stale while scraping \"%s\", finding it again.", branch_code)
+                self.update_dropdown_references()
+                continue
+
+            return rows
+
+        return None
+
+    def scrap_tables(self) -> list[str]:
+        return list(self.iter_tables())
+
+    def iter_branch_code_tables(self, branch_codes: list[str], progress, failed_branch_codes: list[str], schedule=None,
+                                log_prefix: str=""):
+        # Branch codes that couldn't be scraped are added to failed_branch_codes, without a schedule nothing carries
+        # their previous lessons over so the caller has to raise.
+        lesson_count = 0
+        for branch_code in branch_codes:
+            if schedule is not None and not schedule.has_time_for(branch_code):
+                Logger.log_info("%sLesson time budget is used up, the remaining branch codes are carried over.", log_prefix)
                 break
-        
-        return lessons
+
+            if branch_code not in self.option_indices:
+                Logger.log_warning("%s\"%s\" is not in the dropdown of this browser, skipping it.", log_prefix, branch_code)
+                failed_branch_codes.append(branch_code)
+                progress.update(1)
+                continue
+
+            # Update the tqdm.
+            progress.set_description(f"{log_prefix}Scraping \"{branch_code}\" lessons - current total: {lesson_count:04}")
+            with Metrics.stage("fetch"):
+                rows = self.scrap_branch_code_table(branch_code)
+            progress.update(1)
+            if rows is None:
+                # Not marked as scraped, so the schedule carries the previous lessons of it over.
+                Logger.log_error("%sFailed to scrap the lessons of \"%s\", the dropdown kept going stale.", log_prefix, branch_code)
+                failed_branch_codes.append(branch_code)
+                continue
+
+            if schedule is not None:
+                schedule.mark_scraped(branch_code)
+
+            lesson_count += len(rows)
+            yield from rows
+
+    def iter_tables(self, schedule=None):
+        # Yields the rows as they are scraped, so they can be processed without holding the whole table.
+        # If a LessonSchedule is given, the branch codes are scraped in its order and only while it has time for them.
+        branch_codes = self.update_dropdown_references()
+        if schedule is not None:
+            branch_codes = schedule.order(branch_codes)
+
+        progress, failed_branch_codes = tqdm(total=len(branch_codes)), []
+        yield from self.iter_branch_code_tables(branch_codes, progress, failed_branch_codes, schedule)
+        progress.close()
+
+        if schedule is None and failed_branch_codes:
+            raise RuntimeError(f"Failed to scrap the lessons of {len(failed_branch_codes)} branch codes: {failed_branch_codes}")
+
+
+class ParallelLessonScraper:
+    """
+    Scrapes the lessons on multiple browsers from the DriverManager pool, the browsers take the branch codes from a
+    shared queue in order. The rows of all browsers are yielded from a single generator, the order of the rows doesn't
+    matter as lessons.psv is sorted while saving.
+
+    If a browser crashes, it's closed and the branch code it was scraping goes back to the queue for the other browsers,
+    which keep polling the queue until every branch code is done. If branch codes are left unscraped in the end,
+    iter_tables raises so the partial lessons are not saved, unless a LessonSchedule is used which carries the unscraped
+    ones over.
+    """
+
+    def __init__(self, browser_count: int) -> None:
+        self.browser_count = browser_count
+        self.pending_count = 0  # Branch codes that are in the queue or being scraped.
+        self.pending_lock = threading.Lock()
+
+    def scrap_tables(self) -> list[str]:
+        return list(self.iter_tables())
+
+    def finish_branch_code(self) -> None:
+        with self.pending_lock:
+            self.pending_count -= 1
+
+    def iter_branch_codes(self, branch_code_queue: queue.Queue, current_branch_codes: dict, browser_no: int):
+        # An empty queue doesn't mean we are done, a crashed browser might still put its branch code back.
+        while self.pending_count > 0:
+            try:
+                branch_code = branch_code_queue.get(timeout=BRANCH_CODE_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+
+            current_branch_codes[browser_no] = branch_code
+            yield branch_code
+            current_branch_codes[browser_no] = None
+            self.finish_branch_code()
+
+    def browser_routine(self, scraper: LessonScraper|None, branch_code_queue: queue.Queue, row_queue: queue.Queue,
+                        progress, failed_branch_codes: list[str], schedule, browser_no: int) -> None:
+        prefix = f"[Browser {str(browser_no).zfill(2)}] "
+        driver = scraper.webdriver if scraper is not None else None
+        current_branch_codes = {browser_no: None}
+        try:
+            if scraper is None:
+                driver = DriverManager.acquire_driver()
+                scraper = LessonScraper(driver)
+                scraper.update_dropdown_references()
+
+            branch_codes = self.iter_branch_codes(branch_code_queue, current_branch_codes, browser_no)
+            for row in scraper.iter_branch_code_tables(branch_codes, progress, failed_branch_codes, schedule, prefix):
+                row_queue.put(row)
+
+            # The time budget ran out while this branch code was taken, the schedule carries it over.
+            if current_branch_codes[browser_no] is not None:
+                self.finish_branch_code()
+        except Exception as e:
+            # Hand the branch code that was being scraped to the other browsers, nothing of it was yielded yet.
+            if current_branch_codes[browser_no] is not None:
+                branch_code_queue.put(current_branch_codes[browser_no])
+            Logger.log_error("%sBrowser crashed, its remaining branch codes are left to the other browsers. Error: %s", prefix, e)
+
+            # The browser might be in any state, don't hand it out again.
+            if driver is not None:
+                DriverManager.discard_driver(driver)
+                driver = None
+        finally:
+            if driver is not None:
+                DriverManager.release_driver(driver)
+            row_queue.put(None)  # Let the consumer know that this browser is done.
+
+    def iter_tables(self, schedule=None):
+        # The first browser finds the branch codes, every browser then finds its own references to them.
+        first_scraper = LessonScraper(DriverManager.acquire_driver())
+        branch_codes = first_scraper.update_dropdown_references()
+        if schedule is not None:
+            branch_codes = schedule.order(branch_codes)
+
+        branch_code_queue = queue.Queue()
+        for branch_code in branch_codes:
+            branch_code_queue.put(branch_code)
+        self.pending_count = len(branch_codes)
+
+        row_queue = queue.Queue()
+        progress, failed_branch_codes = tqdm(total=len(branch_codes)), []
+        threads = []
+        for i in range(self.browser_count):
+            scraper = first_scraper if i == 0 else None
+            t = threading.Thread(
+                target=self.browser_routine,
+                args=(scraper, branch_code_queue, row_queue, progress, failed_branch_codes, schedule, i),
+            )
+            threads.append(t)
+
+        for t in threads: t.start()
+
+        finished_count = 0
+        while finished_count < len(threads):
+            row = row_queue.get()
+            if row is None:
+                finished_count += 1
+            else:
+                yield row
+
+        for t in threads: t.join()
+        progress.close()
+
+        # The schedule carries over whatever it didn't have time for, without it every branch code has to be scraped.
+        if schedule is None and not branch_code_queue.empty():
+            raise RuntimeError(f"{branch_code_queue.qsize()} branch codes couldn't be scraped, every browser crashed.")
+        if schedule is None and failed_branch_codes:
+            raise RuntimeError(f"Failed to scrap the lessons of {len(failed_branch_codes)} branch codes: {failed_branch_codes}")
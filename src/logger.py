@@ -1,38 +1,140 @@
 from datetime import datetime
 from rich import print as rprint
+import threading
+import atexit
+import queue
+import json
+import time
+import sys
+import re
 
 
 class Logger:
+    """
+    Messages are put on a queue and written by a background thread once start is called, so logging doesn't block
+    the scrapers. Before that (or after stop) they are written right away.
+
+    Messages can take %-style args, e.g. Logger.log_info("Scraped %s courses.", count), they are only formatted
+    if the message is going to be logged, and then on the writer thread.
+    """
+
     log_level = 3  # 0 = nothing, 1 = only errors, 2 = errors + warnings, 3 = all
     time_stamp_color_code = "#999999"
-    
+    console_mode = "rich"  # "rich" renders the markup, "plain" strips it and writes straight to stdout.
+    json_file = None  # If set, every message is also written to it as a JSON line.
+
+    CONSOLE_MODES = ["rich", "plain"]
+
+    # Same as rich's markup tags, so "[Browser 01]" style prefixes are kept in plain mode.
+    MARKUP_TAG_PATTERN = re.compile(r"(?<!\\)\[[a-z#/@][^\[]*?\]")
+
+    queue = None
+    writer_thread = None
+    write_lock = threading.Lock()
+
+    @staticmethod
+    def configure(console_mode: str="rich", json_path: str|None=None) -> None:
+        Logger.console_mode = console_mode
+        if json_path is not None:
+            Logger.json_file = open(json_path, "a", encoding="utf-8")
+
+    @staticmethod
+    def start() -> None:
+        if Logger.writer_thread is not None:
+            return
+
+        Logger.queue = queue.SimpleQueue()
+        Logger.writer_thread = threading.Thread(target=Logger.writer_routine, name="logger", daemon=True)
+        Logger.writer_thread.start()
+        atexit.register(Logger.stop)
+
+    @staticmethod
+    def stop() -> None:
+        # Writes everything that's still in the queue, then goes back to writing right away.
+        if Logger.writer_thread is None:
+            return
+
+        Logger.queue.put(None)
+        Logger.writer_thread.join()
+        Logger.writer_thread, Logger.queue = None, None
+        if Logger.json_file is not None:
+            Logger.json_file.close()
+            Logger.json_file = None
+
     @staticmethod
-    def create_message(message: str, log_type: str, color: str) -> str:
-        time_stamp = f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}"
+    def writer_routine() -> None:
+        while True:
+            record = Logger.queue.get()
+            if record is None:
+                return
+
+            try:
+                Logger.write(*record)
+            except Exception as e:
+                # Never let a bad message kill the writer, the rest of the run's logs would be lost.
+                sys.stderr.write(f"Logger couldn't write a message: {e}\n")
+
+    @staticmethod
+    def format_time_stamp(timestamp: float) -> str:
+        return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+
+    @staticmethod
+    def create_message(message: str, log_type: str, color: str, timestamp: float|None=None) -> str:
+        time_stamp = Logger.format_time_stamp(time.time() if timestamp is None else timestamp)
         return f"[{Logger.time_stamp_color_code}][{time_stamp}][{log_type.upper()}][/{Logger.time_stamp_color_code}][{color}] {message}[/{color}]"
 
     @staticmethod
-    def log(message: str, log_type: str="INFO", color: str = "white") -> None:
-        msg = Logger.create_message(message, log_type, color)
-        rprint(msg)
+    def strip_markup(message: str) -> str:
+        return Logger.MARKUP_TAG_PATTERN.sub("", message)
 
     @staticmethod
-    def log_info(message: str) -> None:
+    def write(timestamp: float, thread_name: str, message: str, args: tuple, log_type: str, color: str) -> None:
+        if args:
+            message = message % args
+
+        with Logger.write_lock:
+            if Logger.console_mode == "plain":
+                time_stamp = Logger.format_time_stamp(timestamp)
+                sys.stdout.write(f"[{time_stamp}][{log_type.upper()}] {Logger.strip_markup(message)}\n")
+                sys.stdout.flush()
+            else:
+                rprint(Logger.create_message(message, log_type, color, timestamp))
+
+            if Logger.json_file is not None:
+                Logger.json_file.write(json.dumps({
+                    "time": datetime.fromtimestamp(timestamp).isoformat(timespec="milliseconds"),
+                    "level": log_type.upper(),
+                    "thread": thread_name,
+                    "message": Logger.strip_markup(message),
+                }, ensure_ascii=False) + "\n")
+
+    @staticmethod
+    def log(message: str, log_type: str="INFO", color: str = "white", *args) -> None:
+        record = (time.time(), threading.current_thread().name, message, args, log_type, color)
+
+        log_queue = Logger.queue
+        if log_queue is not None:
+            log_queue.put(record)
+        else:
+            Logger.write(*record)
+
+    @staticmethod
+    def log_info(message: str, *args) -> None:
         if Logger.log_level < 3:
             return
-        
-        Logger.log(message, "INFO")
+
+        Logger.log(message, "INFO", "white", *args)
 
     @staticmethod
-    def log_warning(message: str) -> None:
+    def log_warning(message: str, *args) -> None:
         if Logger.log_level < 2:
             return
-    
-        Logger.log(message, "WARNING", "yellow")
+
+        Logger.log(message, "WARNING", "yellow", *args)
 
     @staticmethod
-    def log_error(message: str) -> None:
+    def log_error(message: str, *args) -> None:
         if Logger.log_level < 1:
             return
-        
-        Logger.log(message, "ERROR", "red")
+
+        Logger.log(message, "ERROR", "red", *args)
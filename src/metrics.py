@@ -0,0 +1,126 @@
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from time import perf_counter, process_time, thread_time
+from urllib.parse import urlsplit
+import threading
+import json
+import os
+
+from logger import Logger
+
+try:
+    import resource  # Not available on Windows.
+except ImportError:
+    resource = None
+
+
+class Metrics:
+    """
+    Run-wide metrics every scraper reports into, written as a JSON report at the end of the run.
+
+    - stages: wall and CPU time per stage (fetch, parse, normalize, merge, write). CPU time is the time of the thread
+      running the stage, so stages running on worker threads are measured correctly. Stages can be nested, the time
+      spent in a nested stage is only counted for that stage.
+    - hosts: request, error and byte counts per host, with a latency histogram.
+    - counters: anything else worth counting, e.g. retries.
+    """
+
+    LATENCY_BUCKETS = [.05, .1, .25, .5, 1, 2.5, 5, 10, 25]  # Upper bounds in seconds, the last bucket is "more".
+
+    lock = threading.Lock()
+    local = threading.local()  # Stack of [nested wall, nested cpu] of the running stages of each thread.
+    t0 = perf_counter()
+    cpu_t0 = process_time()
+    stages = {}
+    hosts = {}
+    counters = {}
+
+    @staticmethod
+    @contextmanager
+    def stage(name: str):
+        stack = getattr(Metrics.local, "stack", None)
+        if stack is None:
+            stack = Metrics.local.stack = []
+
+        stack.append([0.0, 0.0])
+        t0, cpu_t0 = perf_counter(), thread_time()
+        try:
+            yield
+        finally:
+            wall, cpu = perf_counter() - t0, thread_time() - cpu_t0
+            nested_wall, nested_cpu = stack.pop()
+            if stack:
+                stack[-1][0] += wall
+                stack[-1][1] += cpu
+            wall, cpu = wall - nested_wall, cpu - nested_cpu
+
+            with Metrics.lock:
+                stats = Metrics.stages.setdefault(name, {"count": 0, "wall": 0.0, "cpu": 0.0})
+                stats["count"] += 1
+                stats["wall"] += wall
+                stats["cpu"] += cpu
+
+    @staticmethod
+    def increment(name: str, amount: int=1) -> None:
+        with Metrics.lock:
+            Metrics.counters[name] = Metrics.counters.get(name, 0) + amount
+
+    @staticmethod
+    def record_request(url: str, duration: float, byte_count: int=0, is_error: bool=False) -> None:
+        host = urlsplit(url).netloc
+        bucket = next((i for i, bound in enumerate(Metrics.LATENCY_BUCKETS) if duration <= bound), len(Metrics.LATENCY_BUCKETS))
+
+        with Metrics.lock:
+            stats = Metrics.hosts.get(host)
+            if stats is None:
+                stats = {"requests": 0, "errors": 0, "bytes": 0, "latency_total": 0.0, "latency_max": 0.0,
+                         "latency_histogram": [0] * (len(Metrics.LATENCY_BUCKETS) + 1)}
+                Metrics.hosts[host] = stats
+
+            stats["requests"] += 1
+            stats["errors"] += int(is_error)
+            stats["bytes"] += byte_count
+            stats["latency_total"] += duration
+            stats["latency_max"] = max(stats["latency_max"], duration)
+            stats["latency_histogram"][bucket] += 1
+
+    @staticmethod
+    def get_peak_rss_mb() -> float|None:
+        if resource is None:
+            return None
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)  # ru_maxrss is in KB on Linux.
+
+    @staticmethod
+    def build_report(**extra) -> dict:
+        with Metrics.lock:
+            bucket_labels = [f"<={bound}s" for bound in Metrics.LATENCY_BUCKETS] + [f">{Metrics.LATENCY_BUCKETS[-1]}s"]
+            hosts = {}
+            for host, stats in Metrics.hosts.items():
+                hosts[host] = {
+                    **{key: value for key, value in stats.items() if key != "latency_histogram"},
+                    "latency_average": round(stats["latency_total"] / stats["requests"], 4) if stats["requests"] else 0,
+                    "latency_histogram": dict(zip(bucket_labels, stats["latency_histogram"])),
+                }
+
+            return {
+                "finished_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                **extra,
+                "wall_time": round(perf_counter() - Metrics.t0, 3),
+                "cpu_time": round(process_time() - Metrics.cpu_t0, 3),
+                "peak_rss_mb": Metrics.get_peak_rss_mb(),
+                "stages": {name: {key: round(value, 4) for key, value in stats.items()} for name, stats in Metrics.stages.items()},
+                "hosts": hosts,
+                "counters": dict(Metrics.counters),
+            }
+
+    @staticmethod
+    def write_report(file_path: str, **extra) -> None:
+        report = Metrics.build_report(**extra)
+        if os.path.dirname(file_path):
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+        for name, stats in sorted(report["stages"].items(), key=lambda item: -item[1]["wall"]):
+            Logger.log_info(f"Stage [blue]{name}[/blue]: {stats['wall']} seconds wall, {stats['cpu']} seconds CPU in {stats['count']} calls.")
+        Logger.log_info(f"Metrics report is written to \"{file_path}\", peak RSS was {report['peak_rss_mb']} MB.")
@@ -1,41 +1,51 @@
-from bs4 import BeautifulSoup
-from requests import get
+from concurrent.futures import ThreadPoolExecutor
+
 from constants import *
 from logger import Logger
+from http_client import HttpClient
+from metrics import Metrics
+from html_parser import HtmlParser
+from records import Building, Programme
 
 
 class MiscScraper:
-    def scrap_data(self):
-        # There are 2 diff URLS for buildings for some fking reason, scrap them both the second one has no campus info
-        building_codes = self.scrap_building_codes(BUILDING_CODES_URL) + self.scrap_building_codes(BUILDING_CODES_URL2, default_campus="")
-        
-        # Remove duplicates
-        lines = []
-        for line in building_codes.split("\n"):
-            b = line.split("|")[0]  # Building code
-            for existing_line in lines:
-                # If building code already exists, keep the longer name (longer usually means campus is included)
-                if existing_line.startswith(b + "|"):
-                    if len(line) > len(existing_line):
-                        lines.remove(existing_line)
-                        lines.append(line)
-                    break
-            else:
-                lines.append(line)
-
-        return (
-            "\n".join(lines).strip() + "\n",
-             self.scrap_programme_codes(),
-        )
-
-    def scrap_building_codes(self, url, default_campus="Ayazağa"):
+    def scrap_data(self) -> tuple[list[Building], list[Programme]]:
+        # All pages are independent, fetch them at the same time.
+        with ThreadPoolExecutor(max_workers=2 + len(PROGRAMME_CODES_URLS)) as executor:
+            # There are 2 diff URLS for buildings for some fking reason, scrap them both the second one has no campus info
+            building_futures = [
+                executor.submit(self.scrap_building_codes, BUILDING_CODES_URL),
+                executor.submit(self.scrap_building_codes, BUILDING_CODES_URL2, default_campus=""),
+            ]
+            programme_futures = [
+                executor.submit(self.scrap_programme_codes_of_type, programme_type, url)
+                for programme_type, url in PROGRAMME_CODES_URLS.items()
+            ]
+
+            buildings = self.merge_buildings([building for f in building_futures for building in f.result()])
+            programmes = [programme for f in programme_futures for programme in f.result()]
+
+        return buildings, programmes
+
+    def merge_buildings(self, buildings: list[Building]) -> list[Building]:
+        # If a building code already exists, keep the richer record (longer usually means campus is included).
+        buildings_by_code = {}
+        with Metrics.stage("merge"):
+            for building in buildings:
+                existing_building = buildings_by_code.get(building.code)
+                if existing_building is None or len(building.to_psv()) > len(existing_building.to_psv()):
+                    buildings_by_code[building.code] = building
+
+        return [buildings_by_code[code] for code in sorted(buildings_by_code)]
+
+    def scrap_building_codes(self, url, default_campus="Ayazağa") -> list[Building]:
         Logger.log_info("Scraping building codes...")
 
-        r = get(url)
+        r = HttpClient.get(url)
         r.encoding = r.apparent_encoding
-        soup = BeautifulSoup(r.text, "html.parser")
+        soup = HtmlParser.make_soup(r.text)
 
-        output = ""
+        buildings = []
         for row in soup.find_all("tr"):
             cells = [d.get_text().strip() for d in row.find_all("td")]
 
@@ -51,43 +61,49 @@ class MiscScraper:
             if (campus_name == building_name):
                 campus_name = default_campus
 
-            output += f"{code}|{building_name}|{campus_name}\n"
-
-        return output
+            buildings.append(Building(code, building_name, campus_name))
 
-    def scrap_programme_codes(self):
-        Logger.log_info("Scraping programme codes...")
+        return buildings
 
-        output = ""
+    def scrap_programme_codes(self) -> list[Programme]:
+        programmes = []
         for programme_type, url in PROGRAMME_CODES_URLS.items():
-            r = get(url)
-            r.encoding = r.apparent_encoding
-            soup = BeautifulSoup(r.text, "html.parser")
-
-            tbody = soup.find("tbody")
-            if not tbody:
-                return ""
-
-            current_faculty = ""
-            for element in tbody.children:
-                # Skip text nodes and non-tag elements
-                if not hasattr(element, "name") or element.name is None:
+            programmes += self.scrap_programme_codes_of_type(programme_type, url)
+
+        return programmes
+
+    def scrap_programme_codes_of_type(self, programme_type: str, url: str) -> list[Programme]:
+        Logger.log_info(f"Scraping programme codes of type \"{programme_type}\"...")
+
+        r = HttpClient.get(url)
+        r.encoding = r.apparent_encoding
+        soup = HtmlParser.make_soup(r.text)
+
+        tbody = soup.find("tbody")
+        if not tbody:
+            return []
+
+        programmes = []
+        current_faculty = ""
+        for element in tbody.children:
+            # Skip text nodes and non-tag elements
+            if not hasattr(element, "name") or element.name is None:
+                continue
+
+            # Handle proper rows
+            if element.name == "tr":
+                cells = [d.get_text().strip() for d in element.find_all("td")]
+
+                # There are some empty rows in the table, skip them.
+                if not cells:
                     continue
-                
-                # Handle proper rows
-                if element.name == "tr":
-                    cells = [d.get_text().strip() for d in element.find_all("td")]
-                    
-                    # There are some empty rows in the table, skip them.
-                    if not cells:
-                        continue
-
-                    # Found a faculty row.
-                    if len(cells) == 1:
-                        current_faculty = cells[0].strip()
-                        continue
-
-                    programme_name = cells[0].strip().replace(f"_{programme_type}", "")
-                    output += f"{programme_name}|{cells[1].strip()}|{current_faculty}|{programme_type}\n"
-
-        return output
+
+                # Found a faculty row.
+                if len(cells) == 1:
+                    current_faculty = cells[0].strip()
+                    continue
+
+                programme_name = cells[0].strip().replace(f"_{programme_type}", "")
+                programmes.append(Programme(programme_name, cells[1].strip(), current_faculty, programme_type))
+
+        return programmes
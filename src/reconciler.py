@@ -0,0 +1,81 @@
+from metrics import Metrics
+from logger import Logger
+
+
+class Reconciler:
+    """
+    Reconciles freshly scraped entries with the previously saved ones, keyed by e.g. the course code.
+
+    Every key ends up in one of these:
+    - fresh: scraped this run, the fresh value wins (or merge_value(key, fresh, previous) if the key was saved before).
+    - carried over: only in the saved data, the saved value is kept.
+
+    Fresh entries always come first, followed by the carried over ones in their saved order. Lookups are dict/set based,
+    so reconciling is O(fresh + previous).
+    """
+
+    def __init__(self, name: str, merge_value=None, log_carried_over: bool=True) -> None:
+        self.name = name
+        self.merge_value = merge_value
+        self.log_carried_over = log_carried_over
+        self.fresh_keys = set()
+        self.previous_keys = set()
+        self.counts = {"fresh": 0, "replaced": 0, "merged": 0, "carried_over": 0, "duplicate": 0}
+
+    def mark_fresh(self, key) -> None:
+        # For streaming callers that don't keep the fresh values around, only the key is needed.
+        if key not in self.fresh_keys:
+            self.fresh_keys.add(key)
+            self.counts["fresh"] += 1
+
+    def iter_carried_over(self, previous_items):
+        """
+        Yields the (key, value) pairs of previous_items that are not fresh. Only the first entry of
+        a key duplicated in previous_items is looked at.
+        """
+        for key, value in previous_items:
+            if key in self.previous_keys:
+                self.counts["duplicate"] += 1
+                continue
+
+            self.previous_keys.add(key)
+            if key in self.fresh_keys:
+                self.counts["replaced"] += 1
+                continue
+
+            if self.log_carried_over:
+                Logger.log_info(f"Carrying over {self.name} from local data: [i]\"{key}\"[/i]")
+            self.counts["carried_over"] += 1
+            yield key, value
+
+    def reconcile(self, fresh: dict, previous: dict) -> dict:
+        with Metrics.stage("merge"):
+            reconciled, merged_count = {}, 0
+            for key, value in fresh.items():
+                self.mark_fresh(key)
+                if self.merge_value is not None and key in previous:
+                    value = self.merge_value(key, value, previous[key])
+                    merged_count += 1
+                reconciled[key] = value
+
+            for key, value in self.iter_carried_over(previous.items()):
+                reconciled[key] = value
+
+            # Merged keys were counted as replaced while carrying over.
+            self.counts["merged"] += merged_count
+            self.counts["replaced"] -= merged_count
+        return reconciled
+
+    def add_counts(self, other) -> None:
+        # For summing up the counts of reconcilers that had to be kept apart.
+        for key, count in other.counts.items():
+            self.counts[key] += count
+
+    def log_stats(self) -> None:
+        counts = self.counts
+        Logger.log_info(
+            f"Reconciled {self.name} entries: [green]{counts['fresh']}[/green] fresh "
+            f"({counts['replaced']} replaced, {counts['merged']} merged), "
+            f"[yellow]{counts['carried_over']}[/yellow] carried over, "
+            f"{counts['duplicate']} duplicate."
+        )
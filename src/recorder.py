@@ -0,0 +1,157 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from datetime import datetime, timezone
+from hashlib import sha1
+import threading
+import shutil
+import json
+import os
+
+from logger import Logger
+from constants import *
+
+
+class ReplayRequestHandler(BaseHTTPRequestHandler):
+    # Serves the recorded responses, the path is the key of the recorded URL.
+    def do_GET(self) -> None:
+        entry = Recorder.entries.get(self.path.lstrip("/"))
+        if entry is None:
+            Logger.log_warning(f"Replay: no recorded response for \"{self.path}\".")
+            self.send_error(404, "Not recorded")
+            return
+
+        body = Recorder.read_body(entry)
+        self.send_response(entry["status"])
+        if entry.get("content_type"):
+            self.send_header("Content-Type", entry["content_type"])
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        pass  # Every request is already logged by the scrapers.
+
+
+class Recorder:
+    """
+    Records the HTTP responses (and the page sources Selenium loads) of a run into an archive, so the run can be
+    replayed later without ITU's servers. The archive is a directory:
+
+        manifest.json   {"version": ..., "created_at": ..., "meta": {...}, "entries": {key: {"url", "kind", "status", ...}}}
+        bodies/<key>    the recorded bodies, key is the sha1 of the URL
+        data/           the data files the run started with, the scrapers decide what to fetch based on them
+
+    While replaying, the archive is served by a local HTTP server and the requests are sent to it instead.
+    """
+
+    FORMAT_VERSION = 1
+
+    # Data files read by the scrapers, copied to the archive before the run changes them.
+    SNAPSHOT_FILE_PATHS = [
+        LESSONS_FILE_PATH, LESSONS_CHANGELOG_FILE_PATH, LESSON_SCHEDULE_FILE_PATH, COURSES_FILE_PATH,
+        COURSE_FINGERPRINTS_FILE_PATH, COURSE_CODE_INDEX_FILE_PATH, COURSE_PLANS_FILE_PATH,
+        BUILDING_CODES_FILE_PATH, PROGRAMME_CODES_FILE_PATH,
+    ]
+
+    mode = None  # None, "record" or "replay"
+    archive_dir = None
+    entries = {}
+    lock = threading.Lock()
+    server = None
+    replay_base_url = None
+
+    @staticmethod
+    def get_key(url: str) -> str:
+        return sha1(url.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def get_manifest_path() -> str:
+        return os.path.join(Recorder.archive_dir, "manifest.json")
+
+    @staticmethod
+    def read_body(entry: dict) -> bytes:
+        with open(os.path.join(Recorder.archive_dir, "bodies", entry["key"]), "rb") as f:
+            return f.read()
+
+    @staticmethod
+    def start_recording(archive_dir: str) -> None:
+        Recorder.mode, Recorder.archive_dir, Recorder.entries = "record", archive_dir, {}
+        os.makedirs(os.path.join(archive_dir, "bodies"), exist_ok=True)
+
+        snapshot_dir = os.path.join(archive_dir, "data")
+        os.makedirs(snapshot_dir, exist_ok=True)
+        for file_path in Recorder.SNAPSHOT_FILE_PATHS:
+            if os.path.exists(file_path):
+                shutil.copyfile(file_path, os.path.join(snapshot_dir, os.path.basename(file_path)))
+
+        Logger.log_info(f"Recording the responses to \"{archive_dir}\".")
+
+    @staticmethod
+    def add_entry(url: str, kind: str, status: int, content_type: str|None, body: bytes) -> None:
+        key = Recorder.get_key(url)
+        with open(os.path.join(Recorder.archive_dir, "bodies", key), "wb") as f:
+            f.write(body)
+
+        # The same URL might be requested more than once, the last response wins.
+        with Recorder.lock:
+            Recorder.entries[key] = {"key": key, "url": url, "kind": kind, "status": status, "content_type": content_type}
+
+    @staticmethod
+    def record_response(url: str, resp) -> None:
+        Recorder.add_entry(url, "http", resp.status_code, resp.headers.get("Content-Type"), resp.content)
+
+    @staticmethod
+    def record_page_source(url: str, page_source: str) -> None:
+        Recorder.add_entry(url, "page_source", 200, "text/html; charset=utf-8", page_source.encode("utf-8"))
+
+    @staticmethod
+    def load(archive_dir: str) -> dict:
+        Recorder.archive_dir = archive_dir
+        with open(Recorder.get_manifest_path(), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        if manifest.get("version") != Recorder.FORMAT_VERSION:
+            raise ValueError(
+                f"Recording \"{archive_dir}\" has version {manifest.get('version')}, "
+                f"only version {Recorder.FORMAT_VERSION} can be replayed. Record it again."
+            )
+
+        Recorder.entries = manifest["entries"]
+        return manifest
+
+    @staticmethod
+    def start_replay(archive_dir: str) -> None:
+        manifest = Recorder.load(archive_dir)
+
+        Recorder.server = ThreadingHTTPServer(("127.0.0.1", 0), ReplayRequestHandler)
+        Recorder.server.daemon_threads = True
+        threading.Thread(target=Recorder.server.serve_forever, name="replay_server", daemon=True).start()
+
+        Recorder.replay_base_url = f"http://127.0.0.1:{Recorder.server.server_address[1]}"
+        Recorder.mode = "replay"
+        Logger.log_info(
+            f"Replaying {len(Recorder.entries)} responses recorded at {manifest['created_at']} "
+            f"from \"{archive_dir}\" on {Recorder.replay_base_url}."
+        )
+
+    @staticmethod
+    def get_replay_url(url: str) -> str:
+        return f"{Recorder.replay_base_url}/{Recorder.get_key(url)}"
+
+    @staticmethod
+    def stop(**meta) -> None:
+        if Recorder.mode == "record":
+            manifest = {
+                "version": Recorder.FORMAT_VERSION,
+                "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "meta": meta,
+                "entries": Recorder.entries,
+            }
+            with open(Recorder.get_manifest_path(), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=0)
+            Logger.log_info(f"Recorded {len(Recorder.entries)} responses to \"{Recorder.archive_dir}\".")
+        elif Recorder.mode == "replay":
+            Recorder.server.shutdown()
+            Recorder.server.server_close()
+            Recorder.server = None
+
+        Recorder.mode = None
@@ -0,0 +1,116 @@
+from dataclasses import dataclass
+from typing import ClassVar
+
+from logger import Logger
+
+
+class PsvRecord:
+    """
+    Base of the records stored in the .psv files, a record is a single line with its fields separated by "|".
+
+    Subclasses are slotted dataclasses, FIELDS lists the fields in file order. The last field may contain "|".
+    """
+
+    __slots__ = ()
+    FIELDS: ClassVar[tuple[str, ...]] = ()
+
+    @classmethod
+    def from_psv(cls, line: str):
+        fields = line.rstrip("\n").split("|", len(cls.FIELDS) - 1)
+        fields += [""] * (len(cls.FIELDS) - len(fields))
+        return cls(*fields)
+
+    @classmethod
+    def read_psv(cls, file_path: str):
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if "|" in line:
+                    yield cls.from_psv(line)
+
+    def to_psv(self) -> str:
+        return "|".join([getattr(self, field) for field in self.FIELDS])
+
+
+@dataclass(slots=True)
+class Lesson(PsvRecord):
+    FIELDS: ClassVar[tuple[str, ...]] = (
+        "crn", "course_code", "teaching_method", "instructor", "building", "day", "time", "room", "capacity",
+        "enrolled", "major_restrictions",
+    )
+
+    crn: str
+    course_code: str
+    teaching_method: str
+    instructor: str
+    building: str
+    day: str
+    time: str
+    room: str
+    capacity: str
+    enrolled: str
+    major_restrictions: str
+
+
+@dataclass(slots=True)
+class Course(PsvRecord):
+    FIELDS: ClassVar[tuple[str, ...]] = (
+        "code", "name", "language", "credits", "ects", "course_prerequisites", "major_prerequisites", "description",
+    )
+
+    code: str
+    name: str
+    language: str
+    credits: str
+    ects: str
+    course_prerequisites: str
+    major_prerequisites: str
+    description: str
+
+
+@dataclass(slots=True)
+class Building(PsvRecord):
+    FIELDS: ClassVar[tuple[str, ...]] = ("code", "name", "campus")
+
+    code: str
+    name: str
+    campus: str
+
+
+@dataclass(slots=True)
+class Programme(PsvRecord):
+    FIELDS: ClassVar[tuple[str, ...]] = ("code", "name", "faculty", "programme_type")
+
+    code: str
+    name: str
+    faculty: str
+    programme_type: str
+
+
+class ColumnarExport:
+    # pyarrow is optional, it's only needed when a columnar export is requested.
+    FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+    @staticmethod
+    def export_psv(record_class, psv_path: str, export_format: str) -> str|None:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            import pyarrow.feather as feather
+        except ImportError:
+            Logger.log_warning(f"pyarrow is not installed, skipping the {export_format} export of \"{psv_path}\".")
+            return None
+
+        columns = {field: [] for field in record_class.FIELDS}
+        for record in record_class.read_psv(psv_path):
+            for field in record_class.FIELDS:
+                columns[field].append(getattr(record, field))
+
+        table = pa.table({field: pa.array(values, type=pa.string()) for field, values in columns.items()})
+        output_path = psv_path.rsplit(".", 1)[0] + ColumnarExport.FORMATS[export_format]
+        if export_format == "parquet":
+            pq.write_table(table, output_path)
+        else:
+            feather.write_feather(table, output_path)  # Feather V2 is the Arrow IPC file format.
+
+        Logger.log_info(f"Exported {table.num_rows} rows to \"{output_path}\".")
+        return output_path
@@ -1,55 +1,53 @@
 from time import perf_counter
-from tqdm import tqdm
+startup_t0 = perf_counter()  # Taken before the other imports, so the startup time includes them.
+
+from itertools import islice
 import argparse
-import os
-import re
+import atexit
+import signal
+import sys
 
 from course_scraper import CourseScraper
 from driver_manager import DriverManager
-from lesson_scraper import LessonScraper
+from lesson_scraper import LessonScraper, ParallelLessonScraper
+from lesson_http_scraper import LessonHttpScraper
+from lesson_changelog import LessonChangelog
+from lesson_normalizer import LessonNormalizer
 from misc_scraper import MiscScraper
 from course_plan_scraper import CoursePlanScraper
 from logger import Logger
+from sorted_file_writer import SortedFileWriter
+from reconciler import Reconciler
+from course_plan_store import CoursePlanStore
+from lesson_schedule import LessonSchedule
+from records import Lesson, Course, Building, Programme, ColumnarExport
+from http_cache import HttpCache
+from http_client import HttpClient, ConcurrencyLimiter
+from waits import WaitStats
+from metrics import Metrics
+from recorder import Recorder
 from constants import *
 
-def extract_from_a(a):
-    if ">" not in a:
-        return a
-    return a.split(">")[1].split("<")[0].strip()
-
-
-def split_lesson_row(row):
-    return row.replace("<tr>", "").replace(
-        "</tr>", "").replace("</td>", "").replace("<br>", " ").replace("</br>", "").split("<td>")[1:]
-
-
-def process_lesson_row(row):
-    data = split_lesson_row(row)
-
-    processed_row = data[0] + "|"  # CRN
-    processed_row += extract_from_a(data[1]) + "|"  # Course Code
-    processed_row += data[3] + "|"  # Teaching Method
-    processed_row += data[4] + "|"  # Instructor
-    processed_row += extract_from_a(data[5]) + "|"  # Building
-    processed_row += data[6] + "|"  # Day
-    processed_row += data[7] + "|"  # Time
-    processed_row += data[8] + "|"  # Room
-    processed_row += data[9] + "|"  # Capacity
-    processed_row += data[10] + "|"  # Enrolled
-    processed_row += extract_from_a(data[12])  # Major Rest.
-
-    # Remove multiple spaces and tabs.
-    return re.sub(r'\s*\|\s*', '|', processed_row.replace("\n", "").replace("\t", "")).strip()
+def iter_lesson_lines(rows, batch_size=LESSON_NORMALIZE_BATCH_SIZE):
+    # Rows are normalized a batch at a time as they come in from the scrapers.
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        with Metrics.stage("normalize"):
+            lines = [lesson.to_psv() for lesson in LessonNormalizer.normalize_lesson_rows(batch)]
+        yield from lines
 
 
-def save_lesson_rows(rows):
+def save_lesson_rows(rows, carried_over_rows=()):
     Logger.log_info("Saving Lesson Rows...")
 
-    # Save each row to a different line.
-    lines = [process_lesson_row(row) + "\n" for row in rows]
-    lines.sort()
-    with open(LESSONS_FILE_PATH, "w", encoding="utf-8") as f:
-        f.writelines(lines)
+    # Save each row to a different line, rows are processed as they are scraped and sorted on disk.
+    with SortedFileWriter(LESSONS_FILE_PATH) as writer:
+        for line in iter_lesson_lines(rows):
+            writer.add(line)
+
+        # These come from the previous lessons file, they are already processed.
+        for row in carried_over_rows:
+            writer.add(row)
 
 
 def save_course_rows(rows):
@@ -63,11 +61,10 @@ def save_course_rows(rows):
             .replace(" )", ")") \
             .replace("MIN.", "MIN").replace("MAX.", "MAX")
 
-    # Save each row to a different line.
-    lines = [f"{fix_row_compability(row)}\n" for row in sorted(rows)]
-
-    with open(COURSES_FILE_PATH, "w", encoding="utf-8") as f:
-        f.writelines(lines)
+    # Save each row to a different line, rows are sorted before the compatibility fix like they used to be.
+    with SortedFileWriter(COURSES_FILE_PATH, transform=fix_row_compability) as writer:
+        for row in rows:
+            writer.add(row)
 
 
 def save_course_plans(faculty_course_plans):
@@ -79,136 +76,159 @@ def save_course_plans(faculty_course_plans):
     #        ['MST 221', 'MST 201', ..., {'Selective': ['HSS 201', 'MST 261', ...]}, ... ]
     #   ]
 
-    # Read existing course plans
-    try:
-        existing_data = {}
-        if os.path.exists(COURSE_PLANS_FILE_PATH):
-            Logger.log_info("Reading existing course plans...")
-            current_faculty = None
-            current_plan = None
-            current_iter = None
-            
-            with open(COURSE_PLANS_FILE_PATH, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-                
-                for line in lines:
-                    if line.startswith("# "):  # Faculty
-                        current_faculty = line[2:].strip()
-                        existing_data[current_faculty] = {}
-                    elif line.startswith("## "):  # Plan
-                        current_plan = line[3:].strip()
-                        existing_data[current_faculty][current_plan] = {}
-                    elif line.startswith("### "):  # Iteration
-                        current_iter = line[4:].strip()
-                        existing_data[current_faculty][current_plan][current_iter] = []
-                    elif not line.strip():  # Empty line
-                        continue
-                    else:  # Semester data
-                        if current_faculty and current_plan and current_iter:
-                            if not line.strip():  # Skip completely empty lines
-                                continue
-                            current_semester = existing_data[current_faculty][current_plan][current_iter]
-                            if len(current_semester) < 8:  # Only add if we haven't reached 8 semesters
-                                courses = line.strip().split("=")
-                                current_semester.append(courses)
-        
-        # Merge new data with existing data
-        for existing_faculty in existing_data:
-            if existing_faculty not in faculty_course_plans:
-                Logger.log_info(f"Merging faculty from local data: \"{existing_faculty}\"")
-                faculty_course_plans[existing_faculty] = {}
-            
-            for existing_faculty_plan in existing_data[existing_faculty]:
-                if existing_faculty_plan not in faculty_course_plans[existing_faculty]:
-                    Logger.log_info(f"Merging faculty plan from local data: \"{existing_faculty}/{existing_faculty_plan}\"")
-                    faculty_course_plans[existing_faculty][existing_faculty_plan] = existing_data[existing_faculty][existing_faculty_plan]
-    except Exception as e:
-        Logger.log_error(f"Error while reading existing course plans: {e}")
-    
-    # Generate Lines
-    lines = []
-    faculties_tqdm = tqdm(faculty_course_plans.keys())
-    for faculty in faculties_tqdm:
-        faculties_tqdm.set_description(f"Saving Course Plans of \"{faculty}\"")
-        lines.append(f"# {faculty}\n")
-        for faculty_plan in faculty_course_plans[faculty].keys():
-            lines.append(f"## {faculty_plan}\n")
-            for faculty_plan_iter in faculty_course_plans[faculty][faculty_plan]:
-                lines.append(f"### {faculty_plan_iter}\n")
-
-                semesters = faculty_course_plans[faculty][faculty_plan][faculty_plan_iter]
-                for i, semester in enumerate(semesters):
-                    line = ""
-                    for j, course in enumerate(semester):
-                        if type(course) is dict:
-                            selective_course_title = list(course.keys())[0]
-                            selective_course_codes = course[selective_course_title]
-                            selective_course_title = selective_course_title.replace("\n", "")
-
-                            if len(selective_course_codes) <= 0:
-                                Logger.log_info(f"Empty selective course list found in {faculty} - {faculty_plan} - {faculty_plan_iter} - {i + 1}. semester.")
-                                line += f"[{selective_course_title}*()]"
-                            else:
-                                line += f"[{selective_course_title}*("
-                                for k, course in enumerate(selective_course_codes):
-                                    line += course.replace("\n", "")
-
-                                    if k != len(selective_course_codes) - 1:
-                                        line += "|"
-                                    else:
-                                        line += ")]"
-                        else:
-                            line += course
-
-                        if j != len(semester) - 1:
-                            line += "="
-
-                    lines.append(line + "\n")
-                if len(semesters) < 8:
-                    lines.append("\n" * (8 - len(semesters)))
-
-    # Save lines.
-    with open(COURSE_PLANS_FILE_PATH, "w", encoding="utf-8") as f:
-        f.writelines(lines)
+    with CoursePlanStore() as store:
+        # Only the headers of the existing course plans are indexed, the plans that are carried over are copied from
+        # the old file while writing.
+        try:
+            plan_reconciler = Reconciler("faculty plan")  # Only sums up the counts of the per faculty reconcilers.
+
+            def reconcile_plans(faculty, plans, existing_plans):
+                # Programme names repeat across faculties, so every faculty needs a reconciler of its own.
+                faculty_plan_reconciler = Reconciler("faculty plan")
+                reconciled_plans = faculty_plan_reconciler.reconcile(plans, existing_plans)
+                plan_reconciler.add_counts(faculty_plan_reconciler)
+                return reconciled_plans
+
+            faculty_reconciler = Reconciler("faculty", merge_value=reconcile_plans)
+            faculty_course_plans = faculty_reconciler.reconcile(faculty_course_plans, store.faculties)
+            faculty_reconciler.log_stats()
+            plan_reconciler.log_stats()
+        except Exception as e:
+            Logger.log_error(f"Error while reading existing course plans: {e}")
+
+        with Metrics.stage("write"):
+            counts = store.write(faculty_course_plans)
+
+    Logger.log_info(
+        f"Saved course plans: [green]{counts['changed']}[/green] changed, {counts['unchanged']} unchanged, "
+        f"{counts['copied']} copied from the old file."
+    )
 
 
 def save_misc_data(data):
-    # BUILDING DATA
-    with open(BUILDING_CODES_FILE_PATH, "w", encoding="utf-8") as f:
-        f.writelines(data[0])
+    with Metrics.stage("write"):
+        # BUILDING DATA, already sorted by code.
+        with open(BUILDING_CODES_FILE_PATH, "w", encoding="utf-8") as f:
+            f.writelines([building.to_psv() + "\n" for building in data[0]])
 
-    # PROGRAMME DATA
-    with open(PROGRAMME_CODES_FILE_PATH, "w", encoding="utf-8") as f:
-        f.writelines(data[1])
+        # PROGRAMME DATA, kept in the source order as the course plans are ordered by it.
+        with open(PROGRAMME_CODES_FILE_PATH, "w", encoding="utf-8") as f:
+            f.writelines([programme.to_psv() + "\n" for programme in data[1]])
 
 
 parser = argparse.ArgumentParser(description="Scraps data from ITU's website.")
 parser.add_argument('-scrap_target', type=str,
                     help="options: [lesson, course, course_plan, misc]")
+parser.add_argument('-lesson_engine', type=str, default="selenium", choices=["selenium", "http"],
+                    help="how the lessons are scraped, \"http\" calls the lesson API directly without a browser.")
+parser.add_argument('-lesson_browsers', type=int, default=1,
+                    help="number of browsers the Selenium lesson engine shares the branch codes between.")
+parser.add_argument('-lesson_schedule', action="store_true",
+                    help="scrapes the frequently changing branch codes on every run and rotates the rest within a time budget.")
+parser.add_argument('-lesson_time_budget', type=float, default=LESSON_TIME_BUDGET,
+                    help="seconds the scheduled lesson scraping may spend on the rarely changing branch codes.")
+parser.add_argument('-course_fetch_mode', type=str, default="threads", choices=["threads", "async"],
+                    help="how the course pages are fetched, \"async\" uses a shared queue with bounded in-flight requests.")
+parser.add_argument('-incremental', action="store_true",
+                    help="only re-parses the courses whose page changed since the last run.")
+parser.add_argument('-no_http_cache', action="store_true",
+                    help="disables the on-disk HTTP cache, every page is downloaded from scratch.")
+parser.add_argument('-course_plan_workers', type=int, default=None,
+                    help="number of workers sharing the course plan work queue, by default enough for the concurrency limit.")
+parser.add_argument('-columnar_export', type=str, default=None, choices=list(ColumnarExport.FORMATS.keys()),
+                    help="also exports the scraped .psv files in a columnar format, requires pyarrow.")
+parser.add_argument('-log_console', type=str, default="rich", choices=Logger.CONSOLE_MODES,
+                    help="\"plain\" writes the logs without rich rendering, faster for CI logs.")
+parser.add_argument('-log_json', type=str, default=None,
+                    help="also appends the logs to this file as JSON lines.")
+parser.add_argument('-record', type=str, default=None, metavar="ARCHIVE_DIR",
+                    help="records every response of the run to this directory, so it can be replayed with -replay.")
+parser.add_argument('-replay', type=str, default=None, metavar="ARCHIVE_DIR",
+                    help="replays a recording from a local server instead of sending the requests to ITU.")
+parser.add_argument('-max_concurrency', type=int, default=MAX_CONCURRENT_REQUESTS,
+                    help="maximum number of in-flight requests per host, the adaptive limit never goes above it.")
+parser.add_argument('-no_adaptive_concurrency', action="store_true",
+                    help="disables the adaptive per-host concurrency limit, the scrapers use their fixed worker counts.")
 
 if __name__ == "__main__":
     args = parser.parse_args()
     t0 = perf_counter()
 
-    # Even though some scrappers don't use the given driver, not creating this sometimes throws issues, especially on GitHub Actions.
-    # When creating a driver, we install the Chrome WebDriver. When we create multiple drivers on different threads, the downloads
-    # may conflict and cause issues. So, we create the driver here. This way, even if we don't use it, the WebDriver is installed.
-    driver = DriverManager.create_driver()
+    # Logs are written on a background thread from here on, whatever is left is written at exit.
+    Logger.configure(args.log_console, args.log_json)
+    Logger.start()
+
+    # The metrics report is written at exit, so failed or killed (e.g. timed out in CI) runs leave a report too.
+    run_status = {"status": "failed"}
+    atexit.register(lambda: Metrics.write_report(METRICS_REPORT_FILE_PATH, target=args.scrap_target, **run_status, args=vars(args)))
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))  # Lets the atexit hooks run.
+
+    HttpCache.enabled = not args.no_http_cache
+    HttpClient.configure(pool_maxsize=max(HTTP_POOL_MAXSIZE, args.max_concurrency))
+    ConcurrencyLimiter.configure(enabled=not args.no_adaptive_concurrency, maximum=args.max_concurrency)
+    if args.course_plan_workers is None:
+        args.course_plan_workers = ConcurrencyLimiter.get_worker_count()
+
+    if args.record is not None:
+        Recorder.start_recording(args.record)
+    elif args.replay is not None:
+        Recorder.start_replay(args.replay)
+        if args.scrap_target == "lesson" and args.lesson_engine == "selenium":
+            # The lesson page fills its table with scripts calling ITU, only the API calls of the http engine can be replayed.
+            Logger.log_warning("The Selenium lesson engine can't be replayed, using the http engine instead.")
+            args.lesson_engine = "http"
+
+    # Only the Selenium lesson engine needs a browser, the pool creates the drivers the first time they are acquired.
+    # The WebDriver is installed once behind a lock, so drivers created on different threads don't conflict.
+    DriverManager.set_pool_size(args.lesson_browsers)
+    Logger.log_info(f"Started \"{args.scrap_target}\" in [green]{round(perf_counter() - startup_t0, 2)}[/green] seconds")
 
     if args.scrap_target == "course":
-        course_rows = CourseScraper(None).scrap_courses()
-        save_course_rows(course_rows)
+        course_scraper = CourseScraper(None, incremental=args.incremental)
+        save_course_rows(course_scraper.iter_courses(args.course_fetch_mode, args.max_concurrency))
+        course_scraper.save_fingerprints()
     elif args.scrap_target == "course_plan":
-        faculty_course_plans = CoursePlanScraper(driver).scrap_course_plans()
+        faculty_course_plans = CoursePlanScraper(None).scrap_course_plans(args.course_plan_workers)
         save_course_plans(faculty_course_plans)
     elif args.scrap_target == "misc":  # Scrap Building Codes and Programme Codes
         data = MiscScraper().scrap_data()
         save_misc_data(data)
     elif args.scrap_target == "lesson":
-        lesson_rows = LessonScraper(driver).scrap_tables()
-        save_lesson_rows(lesson_rows)
-
-    DriverManager.kill_driver(driver)
+        previous_lessons = LessonChangelog.load_lesson_index()
+        schedule = LessonSchedule(previous_lessons, args.lesson_time_budget) if args.lesson_schedule else None
+
+        if args.lesson_engine == "http":
+            lesson_rows = LessonHttpScraper().iter_tables(schedule)
+        elif args.lesson_browsers > 1:
+            lesson_rows = ParallelLessonScraper(args.lesson_browsers).iter_tables(schedule)
+        else:
+            lesson_rows = LessonScraper(DriverManager.acquire_driver()).iter_tables(schedule)
+
+        if schedule is not None:
+            # Generators are lazy, carried over rows are only picked once all scraping is done.
+            save_lesson_rows(lesson_rows, schedule.iter_carried_over_rows())
+            schedule.save()
+        else:
+            save_lesson_rows(lesson_rows)
+
+        if previous_lessons is not None:
+            LessonChangelog.append(LessonChangelog.compute_delta(previous_lessons, LessonChangelog.load_lesson_index()))
+
+    if args.columnar_export is not None:
+        exports = {
+            "lesson": [(Lesson, LESSONS_FILE_PATH)],
+            "course": [(Course, COURSES_FILE_PATH)],
+            "misc": [(Building, BUILDING_CODES_FILE_PATH), (Programme, PROGRAMME_CODES_FILE_PATH)],
+        }
+        for record_class, psv_path in exports.get(args.scrap_target, []):
+            ColumnarExport.export_psv(record_class, psv_path, args.columnar_export)
+
+    DriverManager.close_pool()
+    HttpCache.log_stats()
+    HttpClient.log_stats()
+    WaitStats.log_stats()
+    Recorder.stop(target=args.scrap_target, args=vars(args))
+    run_status["status"] = "completed"
 
     t1 = perf_counter()
     Logger.log_info(f"Scraping & Saving Completed in [green]{round(t1 - t0, 2)}[/green] seconds")
@@ -2,23 +2,40 @@ from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
-from requests.adapters import HTTPAdapter
 from selenium.common.exceptions import TimeoutException, StaleElementReferenceException
 
-import requests
-from urllib3.util.retry import Retry
-from bs4 import BeautifulSoup
-from time import sleep
+from time import sleep, perf_counter
 
+from waits import WaitStats
 from logger import Logger
+from http_client import HttpClient
+from recorder import Recorder
+from html_parser import HtmlParser
 
 
 class Scraper:
     SLEEP_DUR = .05
 
+    # Counts the table rows added to the page, a "table rendered" signal that doesn't need polling the rows themselves.
+    TABLE_OBSERVER_SCRIPT = """
+        if (window.__tableVersion === undefined) {
+            window.__tableVersion = 0;
+            new MutationObserver(function (mutations) {
+                for (const mutation of mutations) {
+                    for (const node of mutation.addedNodes) {
+                        if (node.nodeName === "TR" || (node.querySelector && node.querySelector("tr"))) {
+                            window.__tableVersion++;
+                            return;
+                        }
+                    }
+                }
+            }).observe(document.body, {childList: true, subtree: true});
+        }
+        return window.__tableVersion;
+    """
+
     def __init__(self, driver: webdriver.Chrome) -> None:
         self.webdriver = driver
-        self.webdriver_wait = WebDriverWait(self.webdriver, 10)
 
     def is_element_stale(self, element) -> bool:
         try:
@@ -30,9 +47,51 @@ class Scraper:
     def get_attribute_element_pairs(self, elements: list, attribute: str) -> list[tuple]:
         return zip(elements, [e.get_attribute(attribute) for e in elements])
 
-    def load_page(self, url: str, wait_dur: float=3):
-        self.webdriver.get(url)
-        sleep(wait_dur)
+    def load_page(self, url: str):
+        self.webdriver.get(Recorder.get_replay_url(url) if Recorder.mode == "replay" else url)
+        self.wait_for("page_load", lambda driver: driver.execute_script("return document.readyState") == "complete")
+
+        if Recorder.mode == "record":
+            Recorder.record_page_source(url, self.webdriver.page_source)
+
+    def wait_for(self, step: str, condition, driver=None, timeout: float=None):
+        """
+        Waits until condition(driver) returns something truthy and returns it, returns None if it times out. The
+        timeout is learned from the previous waits of the same step unless given, every wait is recorded in WaitStats.
+        """
+        if driver is None:
+            driver = self.webdriver
+
+        adaptive_timeout = WaitStats.get_timeout(step)
+        t0 = perf_counter()
+        try:
+            result = WebDriverWait(driver, timeout or adaptive_timeout.get(), poll_frequency=self.SLEEP_DUR).until(condition)
+        except TimeoutException:
+            WaitStats.record(step, perf_counter() - t0, True)
+            if timeout is None:
+                adaptive_timeout.back_off()
+            return None
+
+        duration = perf_counter() - t0
+        WaitStats.record(step, duration, False)
+        adaptive_timeout.observe(duration)
+        return result
+
+    def get_table_version(self, driver=None) -> int:
+        # Installs the table observer if the page doesn't have it yet.
+        if driver is None:
+            driver = self.webdriver
+
+        return driver.execute_script(self.TABLE_OBSERVER_SCRIPT)
+
+    def wait_for_table_or_alert(self, table_version: int, driver=None) -> str|None:
+        # Returns "alert" if an alert showed up, "table" if rows were added since table_version, None on timeout.
+        def is_table_or_alert_ready(driver):
+            if EC.alert_is_present()(driver):
+                return "alert"
+            return "table" if driver.execute_script("return window.__tableVersion || 0") > table_version else False
+
+        return self.wait_for("table_or_alert", is_table_or_alert_ready, driver)
 
     def switch_to_turkish(self, driver=None, log_prefix: str=""):
         if driver is None:
@@ -62,24 +121,12 @@ class Scraper:
 
     def get_soup_from_url(self, url):
         try:
-            # Retry strategy
-            retry_strategy = Retry(
-                total=5,
-                status_forcelist=[429, 500, 502, 503, 504],
-                method_whitelist=["HEAD", "GET", "OPTIONS"],
-                backoff_factor=1
-            )
-            adapter = HTTPAdapter(max_retries=retry_strategy)
-            http = requests.Session()
-            http.mount("https://", adapter)
-            http.mount("http://", adapter)
-    
-            page = http.get(url, timeout=25)  # Adding a timeout for good measure, ITU's network is usually shit.
-            soup = BeautifulSoup(page.content, "html.parser")
+            page = HttpClient.get(url, timeout=25)  # Adding a timeout for good measure, ITU's network is usually shit.
+            soup = HtmlParser.make_soup(page.content)
             return soup
     
         except Exception as e:
-            Logger.log_error(f"Failed to load the url {url}, error: {e}")
+            Logger.log_error("Failed to load the url %s, error: %s", url, e)
             return None
 
     def find_elements_by_class(self, class_name: str) -> list:
@@ -95,17 +142,12 @@ class Scraper:
         return self.webdriver.find_elements(By.TAG_NAME, tag_name)
 
     def wait(self, multiplier: int = 1):
+        # Plain sleeps are recorded too, so it's visible how much time goes to them.
         sleep(self.SLEEP_DUR * multiplier)
+        WaitStats.record("sleep", self.SLEEP_DUR * multiplier, False)
 
     def wait_until_loaded(self, element):
-        self.webdriver_wait.until(EC.visibility_of(element))
-
-    def wait_for_and_dismiss_alert(self, multiplier: int = 1) -> bool:
-        try:
-            WebDriverWait(self.webdriver, self.SLEEP_DUR * multiplier).until(EC.alert_is_present())
-            return self.dismiss_alert()
-        except TimeoutException:
-            return False
+        self.wait_for("element_visible", EC.visibility_of(element))
 
     def dismiss_alert(self, driver=None) -> bool:
         if driver is None:
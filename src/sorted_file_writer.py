@@ -0,0 +1,88 @@
+import tempfile
+import heapq
+import os
+
+from metrics import Metrics
+from constants import *
+
+
+class SortedFileWriter:
+    """
+    Writes lines to a file in sorted order without keeping all of them in memory.
+
+    Lines are buffered up to run_size, then sorted and spilled to a temporary run file. On close, the runs are merged
+    with a k-way merge into a temporary file which then atomically replaces file_path. Lines are compared as UTF-8
+    bytes, which gives the same order as sorting the strings. transform, if given, is applied to each line (without the
+    line ending) right before it is written, after sorting.
+    """
+
+    def __init__(self, file_path: str, transform=None, run_size: int=SORTED_FILE_RUN_SIZE) -> None:
+        self.file_path = file_path
+        self.transform = transform
+        self.run_size = run_size
+        self.buffer = []
+        self.run_paths = []
+        self.line_count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def add(self, line: str) -> None:
+        self.buffer.append(f"{line}\n".encode("utf-8"))
+        self.line_count += 1
+        if len(self.buffer) >= self.run_size:
+            self.spill()
+
+    def spill(self) -> None:
+        if len(self.buffer) == 0:
+            return
+
+        with Metrics.stage("write"):
+            self.buffer.sort()
+            fd, run_path = tempfile.mkstemp(prefix=".sort_run_", dir=os.path.dirname(self.file_path) or ".")
+            with os.fdopen(fd, "wb") as f:
+                f.writelines(self.buffer)
+
+        self.run_paths.append(run_path)
+        self.buffer = []
+
+    def write_lines(self, f, lines) -> None:
+        if self.transform is None:
+            f.writelines(lines)
+            return
+
+        for line in lines:
+            f.write(f"{self.transform(line.decode('utf-8')[:-1])}\n".encode("utf-8"))
+
+    def close(self) -> None:
+        tmp_path = f"{self.file_path}.tmp"
+        run_files = []
+        try:
+            with Metrics.stage("write"), open(tmp_path, "wb") as f:
+                # Everything fit in a single run, no need to touch the disk for it.
+                if len(self.run_paths) == 0:
+                    self.buffer.sort()
+                    self.write_lines(f, self.buffer)
+                else:
+                    self.spill()
+                    run_files = [open(run_path, "rb") for run_path in self.run_paths]
+                    self.write_lines(f, heapq.merge(*run_files))
+
+            os.replace(tmp_path, self.file_path)
+        finally:
+            for run_file in run_files:
+                run_file.close()
+            self.discard()
+
+    def discard(self) -> None:
+        self.buffer = []
+        for path in self.run_paths + [f"{self.file_path}.tmp"]:
+            if os.path.exists(path):
+                os.remove(path)
+        self.run_paths = []
@@ -0,0 +1,83 @@
+import threading
+
+from logger import Logger
+
+
+class AdaptiveTimeout:
+    """
+    Timeout of a wait step learned from how long the step took before, the same way TCP picks its retransmission
+    timeout: a moving average of the latency plus 4 times its moving deviation, clamped to [minimum, maximum].
+    """
+
+    def __init__(self, initial: float, minimum: float, maximum: float, alpha: float=.125, beta: float=.25) -> None:
+        self.timeout = initial
+        self.minimum, self.maximum = minimum, maximum
+        self.alpha, self.beta = alpha, beta
+        self.average = None
+        self.deviation = 0.0
+        self.lock = threading.Lock()
+
+    def get(self) -> float:
+        return self.timeout
+
+    def observe(self, duration: float) -> None:
+        with self.lock:
+            if self.average is None:
+                self.average, self.deviation = duration, duration / 2
+            else:
+                self.deviation = (1 - self.beta) * self.deviation + self.beta * abs(duration - self.average)
+                self.average = (1 - self.alpha) * self.average + self.alpha * duration
+
+            self.timeout = min(self.maximum, max(self.minimum, self.average + 4 * self.deviation))
+
+    def back_off(self) -> None:
+        # The step timed out, give it more time next time.
+        with self.lock:
+            self.timeout = min(self.maximum, self.timeout * 2)
+
+
+class WaitStats:
+    # step -> {"count": int, "timeouts": int, "total": float, "max": float}
+    lock = threading.Lock()
+    steps = {}
+
+    # step -> AdaptiveTimeout, shared by every scraper (and browser) so they all learn from each other.
+    timeouts = {}
+
+    # step -> (initial, minimum, maximum) in seconds.
+    TIMEOUT_LIMITS = {
+        "page_load": (10, 2, 30),
+        "dropdown_options": (10, 1, 30),
+        "element_visible": (10, 1, 10),
+        "table_or_alert": (5, .5, 20),
+    }
+    DEFAULT_TIMEOUT_LIMITS = (10, 1, 30)
+
+    @staticmethod
+    def get_timeout(step: str) -> AdaptiveTimeout:
+        with WaitStats.lock:
+            if step not in WaitStats.timeouts:
+                initial, minimum, maximum = WaitStats.TIMEOUT_LIMITS.get(step, WaitStats.DEFAULT_TIMEOUT_LIMITS)
+                WaitStats.timeouts[step] = AdaptiveTimeout(initial, minimum, maximum)
+            return WaitStats.timeouts[step]
+
+    @staticmethod
+    def record(step: str, duration: float, timed_out: bool) -> None:
+        with WaitStats.lock:
+            stats = WaitStats.steps.setdefault(step, {"count": 0, "timeouts": 0, "total": 0.0, "max": 0.0})
+            stats["count"] += 1
+            stats["timeouts"] += int(timed_out)
+            stats["total"] += duration
+            stats["max"] = max(stats["max"], duration)
+
+    @staticmethod
+    def log_stats() -> None:
+        for step, stats in sorted(WaitStats.steps.items()):
+            # Plain sleeps don't have a timeout.
+            adaptive_timeout = WaitStats.timeouts.get(step)
+            timeout_info = f" Current timeout is {round(adaptive_timeout.get(), 2)} seconds." if adaptive_timeout else ""
+            Logger.log_info(
+                f"Waited for [blue]{step}[/blue] {stats['count']} times: {round(stats['total'], 2)} seconds in total, "
+                f"{round(stats['total'] / stats['count'], 3)} on average, {round(stats['max'], 2)} at most, "
+                f"[red]{stats['timeouts']}[/red] timeouts.{timeout_info}"
+            )
@@ -0,0 +1,5 @@
+import sys
+import os
+
+# The modules in src import each other by name, like run.py does.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
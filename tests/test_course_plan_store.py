@@ -0,0 +1,60 @@
+from course_plan_store import CoursePlanStore, StoredPlan
+
+
+PLANS = {
+    "Faculty A": {
+        "Programme 1": {
+            "2020-2021 Güz": [["MAT 103E", "PHY 101E"], ["MAT 104E", {"Seçmeli": ["HSS 201", "HSS 202"]}]],
+            "2021-2022 Güz": [["MAT 103E"]],
+        },
+        "Programme 2": {"Tüm Öğrenciler İçin": [["BLG 101E"], [], ["BLG 102E"]]},
+    },
+    "Faculty B": {
+        "Programme 1": {"2020-2021 Güz": [["END 101"]]},
+    },
+}
+
+
+def write_plans(file_path: str) -> None:
+    with CoursePlanStore(file_path) as store:
+        store.write(PLANS)
+
+
+def test_index_points_to_every_plan(tmp_path):
+    file_path = str(tmp_path / "course_plans.txt")
+    write_plans(file_path)
+
+    with CoursePlanStore(file_path) as store:
+        assert {faculty: list(plans) for faculty, plans in store.faculties.items()} == \
+               {faculty: list(plans) for faculty, plans in PLANS.items()}
+        assert store.get_plan("Faculty B", "Programme 2") is None
+
+        plan = store.get_plan("Faculty A", "Programme 1")
+        assert list(plan.iterations) == ["2020-2021 Güz", "2021-2022 Güz"]
+        assert plan.read_raw().startswith("## Programme 1\n### 2020-2021 Güz\n".encode("utf-8"))
+
+
+def test_stored_plans_load_what_was_written(tmp_path):
+    file_path = str(tmp_path / "course_plans.txt")
+    write_plans(file_path)
+
+    with CoursePlanStore(file_path) as store:
+        # Empty semesters are written as empty lines, they are not loaded back.
+        assert store.get_plan("Faculty A", "Programme 1").load() == PLANS["Faculty A"]["Programme 1"]
+        assert store.get_plan("Faculty A", "Programme 2").load() == {"Tüm Öğrenciler İçin": [["BLG 101E"], ["BLG 102E"]]}
+        assert store.get_plan("Faculty B", "Programme 1").load() == PLANS["Faculty B"]["Programme 1"]
+
+
+def test_stored_plans_are_copied_as_is(tmp_path):
+    file_path = str(tmp_path / "course_plans.txt")
+    write_plans(file_path)
+    with open(file_path, "rb") as f:
+        original = f.read()
+
+    with CoursePlanStore(file_path) as store:
+        counts = store.write({faculty: dict(plans) for faculty, plans in store.faculties.items()})
+        assert all(isinstance(plan, StoredPlan) for plans in store.faculties.values() for plan in plans.values())
+
+    assert counts == {"copied": 3, "changed": 0, "unchanged": 0}
+    with open(file_path, "rb") as f:
+        assert f.read() == original
@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+from lesson_http_scraper import LessonHttpScraper
+from lesson_normalizer import LessonNormalizer
+
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "lessons_api_response.html")
+
+# The lessons.psv lines the Selenium scraper gives for the same table.
+EXPECTED_LINES = [
+    "30141|BLG 101E|Yüz yüze|Ayşe Öztürk, Çağrı Şahin|EEB|Pazartesi Çarşamba|0830/1129 1330/1529|5202 5301|80|78|BLG, BLGE, YZVE",
+    "30502|BLG 492E|Yüz yüze|--|--|--|--|--|0|3|&nbsp;",
+    "31877|BLG 336E|Çevrimiçi (Senkron)|İsmail Ünal|--|Perşembe|1430/1729|--|120|117|BLG, BLGE, MTH &amp; BLG",
+]
+
+
+def read_fixture() -> str:
+    with open(FIXTURE_PATH, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def test_rows_are_serialized_like_outer_html():
+    rows = LessonHttpScraper.get_table_rows(read_fixture())
+
+    assert len(rows) == 3
+    assert "<br>" in rows[0] and "<br/>" not in rows[0]
+    assert "<td>&nbsp;</td>" in rows[1]
+    assert [lesson.to_psv() for lesson in LessonNormalizer.normalize_lesson_rows(rows)] == EXPECTED_LINES
+
+
+def test_failed_branch_codes_raise_without_a_schedule():
+    scraper = LessonHttpScraper()
+    scraper.get_branch_codes = lambda: [("1", "BLG"), ("2", "MAT")]
+
+    def scrap_table(branch_code_id: str) -> list[str]:
+        if branch_code_id == "2":
+            raise ConnectionError("timed out")
+        return LessonHttpScraper.get_table_rows(read_fixture())
+
+    scraper.scrap_table = scrap_table
+    rows = []
+    with pytest.raises(RuntimeError, match="MAT"):
+        for row in scraper.iter_tables():
+            rows.append(row)
+
+    assert len(rows) == 3
@@ -0,0 +1,76 @@
+import re
+import os
+
+import pytest
+
+from lesson_http_scraper import LessonHttpScraper
+from lesson_normalizer import LessonNormalizer
+
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "lessons_api_response.html")
+
+
+# The per-row normalization run.py used before LessonNormalizer, kept as is to check the output didn't change.
+def extract_from_a(a):
+    if ">" not in a:
+        return a
+    return a.split(">")[1].split("<")[0].strip()
+
+
+def split_lesson_row(row):
+    return row.replace("<tr>", "").replace(
+        "</tr>", "").replace("</td>", "").replace("<br>", " ").replace("</br>", "").split("<td>")[1:]
+
+
+def process_lesson_row(row):
+    data = split_lesson_row(row)
+
+    processed_row = data[0] + "|"  # CRN
+    processed_row += extract_from_a(data[1]) + "|"  # Course Code
+    processed_row += data[3] + "|"  # Teaching Method
+    processed_row += data[4] + "|"  # Instructor
+    processed_row += extract_from_a(data[5]) + "|"  # Building
+    processed_row += data[6] + "|"  # Day
+    processed_row += data[7] + "|"  # Time
+    processed_row += data[8] + "|"  # Room
+    processed_row += data[9] + "|"  # Capacity
+    processed_row += data[10] + "|"  # Enrolled
+    processed_row += extract_from_a(data[12])  # Major Rest.
+
+    # Remove multiple spaces and tabs.
+    return re.sub(r'\s*\|\s*', '|', processed_row.replace("\n", "").replace("\t", "")).strip()
+
+
+def make_row(*cells: str) -> str:
+    # Selenium's outerHTML keeps the indentation of the page.
+    return "<tr>\n\t" + "".join(f"<td>{cell}</td>\n\t" for cell in cells) + "</tr>"
+
+
+def read_fixture_rows() -> list[str]:
+    with open(FIXTURE_PATH, "r", encoding="utf-8") as f:
+        return LessonHttpScraper.get_table_rows(f.read())
+
+
+ROWS = read_fixture_rows() + [
+    # Multi-day, the days, times and rooms are separated with <br>.
+    make_row("22001", '<a href="#">ŞEH 201</a>', "Şehir Planlama", "Yüz yüze", "Gülşen Ağaoğlu",
+             '<a href="#">MMF</a><br><a href="#">MMF</a>', "Salı<br>Perşembe", "0930/1129<br>1330/1429",
+             "D-301<br>D-302", "  45 ", "44", "Yok", "ŞEH, ŞEHE"),
+    # Empty cells.
+    make_row("", '<a href="#"></a>', "", "", "", '<a href="#"></a>', "", "", "", "", "", "", ""),
+    # No lessons scheduled yet.
+    make_row("22002", '<a href="#">İNŞ 492</a>', "Bitirme", "--", "--", "--", "--", "--", "--", "0", "0", "--", "--"),
+    # A "|" inside a field, the separators around it are cleaned too.
+    make_row("22003", '<a href="#">ÇEV 101</a>', "Çevre", "Uzaktan | Senkron", "Öğr. Gör. Işıl  Çelik",
+             '<a href="#">--</a>', "Cuma", "1530/1729", "--", "30", "12", "Yok", "ÇEV | ÇEVE"),
+]
+
+
+@pytest.mark.parametrize("row", ROWS)
+def test_same_output_as_the_per_row_normalization(row):
+    assert LessonNormalizer.normalize_lesson_row(row).to_psv() == process_lesson_row(row)
+
+
+def test_batches_keep_the_order():
+    assert [lesson.to_psv() for lesson in LessonNormalizer.normalize_lesson_rows(ROWS)] == \
+           [process_lesson_row(row) for row in ROWS]
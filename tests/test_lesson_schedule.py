@@ -0,0 +1,49 @@
+from lesson_schedule import LessonSchedule
+
+
+PREVIOUS_LESSONS = {
+    "30141": "30141|BLG 101E|Yüz yüze|Ayşe Öztürk|EEB|Pazartesi|0830/1129|5202|80|78|BLG",
+    "30142": "30142|BLG 102E|Yüz yüze|Ayşe Öztürk|EEB|Salı|0830/1129|5202|80|78|BLG",
+    "20100": "20100|MAT 103E|Yüz yüze|İsmail Ünal|FEB|Cuma|1330/1529|A11|120|117|-",
+    "10001": "10001|ESK 101|Yüz yüze|--|--|--|--|--|0|0|-",
+}
+
+
+def make_schedule(tmp_path, monkeypatch, time_budget: float) -> LessonSchedule:
+    # There is no changelog in the empty directory, so every branch code is cold.
+    monkeypatch.chdir(tmp_path)
+    return LessonSchedule(PREVIOUS_LESSONS, time_budget, file_path=str(tmp_path / "lesson_schedule.json"))
+
+
+def test_unscraped_branch_codes_are_carried_over(tmp_path, monkeypatch):
+    schedule = make_schedule(tmp_path, monkeypatch, time_budget=60)
+    schedule.order([("1", "MAT"), ("2", "BLG")], lambda b: b[1])
+
+    schedule.mark_scraped("BLG")
+    # ESK is not listed anymore, its lessons are dropped.
+    assert list(schedule.iter_carried_over_rows()) == [PREVIOUS_LESSONS["20100"]]
+
+
+def test_time_budget_cuts_off_cold_branch_codes(tmp_path, monkeypatch):
+    schedule = make_schedule(tmp_path, monkeypatch, time_budget=0)
+    schedule.order(["BLG", "MAT"])
+    assert not schedule.has_time_for("BLG")
+    assert list(schedule.iter_carried_over_rows()) == [
+        PREVIOUS_LESSONS["30141"], PREVIOUS_LESSONS["30142"], PREVIOUS_LESSONS["20100"],
+    ]
+
+    schedule = make_schedule(tmp_path, monkeypatch, time_budget=60)
+    schedule.order(["BLG", "MAT"])
+    assert schedule.has_time_for("BLG")
+
+
+def test_scraped_branch_codes_are_saved(tmp_path, monkeypatch):
+    schedule = make_schedule(tmp_path, monkeypatch, time_budget=60)
+    schedule.order(["BLG", "MAT"])
+    schedule.mark_scraped("MAT")
+    schedule.save()
+
+    schedule = make_schedule(tmp_path, monkeypatch, time_budget=60)
+    assert list(schedule.last_scraped) == ["MAT"]
+    # Never scraped branch codes come first.
+    assert schedule.order(["MAT", "BLG"]) == ["BLG", "MAT"]
@@ -0,0 +1,41 @@
+import os
+
+from course_plan_store import CoursePlanStore
+from run import save_course_plans
+from constants import COURSE_PLANS_FILE_PATH
+
+
+def make_plan(*semesters):
+    return {"2020-2021 Güz": [list(s) for s in semesters]}
+
+
+def read_plans() -> dict:
+    with CoursePlanStore() as store:
+        return {
+            faculty: {programme: plan.load() for programme, plan in plans.items()}
+            for faculty, plans in store.faculties.items()
+        }
+
+
+def test_programmes_with_the_same_name_are_kept_per_faculty(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.dirname(COURSE_PLANS_FILE_PATH))
+
+    old_plans = {
+        "F0": {"P3": make_plan(["F0 P3"]), "P1": make_plan(["F0 P1"])},
+        "F4": {"P3": make_plan(["F4 P3"]), "P1": make_plan(["F4 P1"])},
+    }
+    with CoursePlanStore() as store:
+        store.write(old_plans)
+
+    save_course_plans({
+        "F0": {"P1": make_plan(["F0 P1 new"])},
+        "F5": {"P4": make_plan(["F5 P4"])},
+        "F4": {"P0": make_plan(["F4 P0"])},
+    })
+
+    plans = read_plans()
+    assert list(plans) == ["F0", "F5", "F4"]
+    assert plans["F0"] == {"P1": make_plan(["F0 P1 new"]), "P3": make_plan(["F0 P3"])}
+    assert plans["F5"] == {"P4": make_plan(["F5 P4"])}
+    assert plans["F4"] == {"P0": make_plan(["F4 P0"]), "P3": make_plan(["F4 P3"]), "P1": make_plan(["F4 P1"])}
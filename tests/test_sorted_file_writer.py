@@ -0,0 +1,46 @@
+import random
+import os
+
+import pytest
+
+from sorted_file_writer import SortedFileWriter
+
+
+LINES = [f"{code} {number}|{name}" for code, number, name in [
+    ("MAT", 103, "Matematik I"), ("İNŞ", 201, "Statik"), ("BLG", 101, "Bilgisayar"), ("ÇEV", 102, "Çevre"),
+    ("END", 211, "Olasılık"), ("ŞEH", 301, "Şehir Planlama"), ("FIZ", 101, "Fizik I"), ("BLG", 101, "Bilgisayar"),
+] for _ in range(3)]
+
+
+def read_lines(file_path: str) -> list[str]:
+    with open(file_path, "r", encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+def test_runs_are_merged_in_sorted_order(tmp_path):
+    file_path = str(tmp_path / "courses.psv")
+    lines = LINES.copy()
+    random.Random(0).shuffle(lines)
+
+    with SortedFileWriter(file_path, transform=str.upper, run_size=5) as writer:
+        for line in lines:
+            writer.add(line)
+        assert len(writer.run_paths) > 1
+
+    assert read_lines(file_path) == [line.upper() for line in sorted(lines)]
+    assert os.listdir(tmp_path) == ["courses.psv"]
+
+
+def test_failed_write_keeps_the_old_file(tmp_path):
+    file_path = str(tmp_path / "courses.psv")
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("old\n")
+
+    with pytest.raises(ValueError):
+        with SortedFileWriter(file_path, run_size=5) as writer:
+            for line in LINES:
+                writer.add(line)
+            raise ValueError("scraping failed")
+
+    assert read_lines(file_path) == ["old"]
+    assert os.listdir(tmp_path) == ["courses.psv"]